@@ -0,0 +1,337 @@
+"""DeBrief 오프라인 벤치마크.
+
+Yahoo, Google News, Finviz, ForexFactory, Telegram, JSONBin, 번역기를 bench_fixtures/ 기반의
+로컬 가짜 서버로 바꿔 모니터 사이클과 봇 명령어를 종목 수별로 돌려 본다. 네트워크는 쓰지 않는다.
+
+    python bench.py                                  # 10, 100, 1000 종목
+    python bench.py --tickers 100 --latency 0.05 --error-rate 0.02
+    python bench.py --tickers 1000 --cycles 5 --out bench_output.txt
+
+사이클별 소요 시간(단계별), 호스트별 요청 수, 명령어 응답 시간, 최대 메모리(tracemalloc),
+알림 적재 -> 텔레그램 발송 지연을 출력한다.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import string
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+import requests
+
+from harness import FIXTURES, Report, enter_workdir
+
+BENCH_COMMANDS = ['p', 'summary', 'earning', 'news', 'sec', 'eco', 'list']
+BENCH_COMMAND_SAMPLES = 20   # 명령어별로 호출해 볼 종목 수
+BENCH_BURST = 8   # 동시 명령어 수
+HOST_LABELS = {'query1.finance.yahoo.com': 'yahoo', 'news.google.com': 'news', 'translate.google.com': 'translate',
+               'finviz.com': 'finviz', 'nfs.faireconomy.media': 'eco', 'api.telegram.org': 'telegram', 'api.jsonbin.io': 'jsonbin'}
+
+# ---------------------------------------------------------
+# 가짜 외부 서비스
+# ---------------------------------------------------------
+class Upstream:
+    """호스트별 지연/오류율을 흉내 내는 공통 부분. 요청 수는 호스트별로 센다"""
+    def __init__(self, latency, error_rate, seed):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = {}
+
+    def hit(self, host):
+        with self.lock:
+            self.requests[host] = self.requests.get(host, 0) + 1
+            fail = self.rng.random() < self.error_rate
+            delay = self.latency * self.rng.uniform(0.5, 1.5)
+        if delay: time.sleep(delay)
+        return fail
+
+    def counts(self):
+        with self.lock: return dict(self.requests)
+
+
+def load_template(name):
+    with open(os.path.join(FIXTURES, name), 'r', encoding='utf-8') as f: return string.Template(f.read())
+
+
+def make_response(url, status=200, body=b"", headers=None):
+    resp = requests.Response()
+    resp.status_code = status; resp.url = url; resp._content = body; resp.encoding = 'utf-8'
+    resp.headers.update(headers or {})
+    return resp
+
+
+class FakeTransport:
+    """HttpClient.transport 자리에 들어가는 가짜 HTTP 서버 묶음"""
+    def __init__(self, upstream):
+        self.upstream = upstream
+        self.rss = load_template('google_news.rss')
+        self.finviz = load_template('finviz_quote.html')
+        self.calendar = load_template('ff_calendar_thisweek.xml')
+        self.pubdate = datetime.now(timezone.utc).strftime('%a, %d %b %Y %H:%M:%S GMT')
+        monday = datetime.now(timezone.utc).date() - timedelta(days=datetime.now(timezone.utc).weekday())
+        self.days = {f"day{i}": (monday + timedelta(days=i)).strftime('%m-%d-%Y') for i in range(5)}
+
+    def _cached(self, url, kw, body):
+        """ETag가 같으면 304 (실서버의 조건부 GET 응답 흉내)"""
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+        if (kw.get('headers') or {}).get('If-None-Match') == etag:
+            return make_response(url, 304, b"", {'ETag': etag})
+        return make_response(url, 200, body, {'ETag': etag})
+
+    def __call__(self, method, url, timeout=None, **kw):
+        parts = urlsplit(url)
+        host = (parts.hostname or "").removeprefix("www.")
+        fail = self.upstream.hit(host)
+        if host == 'api.telegram.org':
+            if fail: return make_response(url, 429, b'{"ok":false,"parameters":{"retry_after":1}}')
+            return make_response(url, 200, b'{"ok":true,"result":{}}')
+        if fail: raise requests.ConnectionError(f"bench: injected failure for {host}")
+        if host == 'news.google.com':
+            ticker = parse_qs(parts.query).get('q', [''])[0].split()[0]
+            return self._cached(url, kw, self.rss.safe_substitute(ticker=ticker, pubdate=self.pubdate).encode('utf-8'))
+        if host == 'finviz.com':
+            ticker = parse_qs(parts.query).get('t', [''])[0]
+            return make_response(url, 200, self.finviz.safe_substitute(ticker=ticker).encode('utf-8'))
+        if host == 'nfs.faireconomy.media':
+            return self._cached(url, kw, self.calendar.safe_substitute(self.days).encode('utf-8'))
+        if host == 'api.jsonbin.io':
+            return make_response(url, 200, json.dumps({'record': {}}).encode('utf-8'))
+        return make_response(url, 404)
+
+
+class FakeYahoo:
+    """yfinance 대역. 녹화된 일봉 한 벌을 종목별로 배율/잡음을 줘 늘리고, 호출마다 마지막 봉을 흔든다"""
+    def __init__(self, upstream, tickers, seed):
+        self.upstream = upstream
+        self.rng = np.random.default_rng(seed)
+        base = pd.read_csv(os.path.join(FIXTURES, 'ohlcv_daily.csv'), index_col=0)
+        index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=len(base))
+        frames = {}
+        for t in tickers:
+            scale = 5 + int(hashlib.md5(t.encode()).hexdigest()[:4], 16) % 500
+            drift = np.exp(np.cumsum(self.rng.normal(0, 0.004, len(base))))[:, None]
+            f = base.copy(); f.iloc[:, :5] = f.iloc[:, :5].values * scale * drift
+            frames[t] = f.set_index(index)
+        self.data = pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1)
+        self.data.columns.names = ['Price', 'Ticker']
+        self.values = self.data.to_numpy(dtype=float)   # 호출마다 흔드는 원본 (프레임은 응답 때만 만듦)
+        self.fields = {f: self.data.columns.get_indexer([(f, t) for t in tickers]) for f in self.data.columns.levels[0]}
+        self.lock = threading.Lock()
+
+    def _tick(self):
+        """장중 시세 변화: 마지막 봉 종가를 정규분포로 움직이고 고가/저가를 맞춤"""
+        last = self.values[-1]
+        close = last[self.fields['Close']] * (1 + self.rng.normal(0, 0.012, len(self.fields['Close'])))
+        last[self.fields['Close']] = close; last[self.fields['Adj Close']] = close
+        last[self.fields['High']] = np.maximum(last[self.fields['High']], close)
+        last[self.fields['Low']] = np.minimum(last[self.fields['Low']], close)
+
+    def download(self, tickers, start=None, period=None, **kw):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        if self.upstream.hit('query1.finance.yahoo.com'): return pd.DataFrame()   # yfinance는 실패해도 예외 없이 빈 프레임
+        with self.lock:
+            self._tick()
+            rows = self.data.index.searchsorted(pd.Timestamp(start)) if start else 0
+            if period and period.endswith('d'): rows = max(0, len(self.data) - int(period[:-1]))
+            cols = self.data.columns.get_indexer(pd.MultiIndex.from_product([self.data.columns.levels[0], tickers]))
+            cols = cols[cols >= 0]
+            return pd.DataFrame(self.values[rows:, cols], index=self.data.index[rows:], columns=self.data.columns[cols])
+
+    def Ticker(self, ticker):
+        self.upstream.hit('query1.finance.yahoo.com')
+        return SimpleNamespace(fast_info=SimpleNamespace(market_cap=123.4e9), earnings_dates=None)
+
+
+class FakeTranslator:
+    """GoogleTranslator 대역. 줄 수를 유지해 일괄 번역 경로를 그대로 탄다"""
+    def __init__(self, upstream):
+        self.upstream = upstream
+
+    def translate(self, text):
+        if self.upstream.hit('translate.google.com'): raise requests.ConnectionError("bench: injected translate failure")
+        return "\n".join(f"[ko] {line}" for line in text.split("\n"))
+
+
+class FakeBot:
+    """telebot.TeleBot 대역. 핸들러를 모아 두고 답장은 가짜 Telegram API로 보냄"""
+    def __init__(self, engine):
+        self.engine = engine
+        self.handlers = {}
+
+    def message_handler(self, commands=None, **kw):
+        def register(fn):
+            for c in commands or []: self.handlers[c] = fn
+            return fn
+        return register
+
+    def send_message(self, chat_id, text, **kw):
+        self.engine.http.post("https://api.telegram.org/botbench/sendMessage", data={"chat_id": chat_id, "text": text}, timeout=10)
+
+    def reply_to(self, m, text, **kw): self.send_message(m.chat.id, text, **kw)
+
+    def send_chat_action(self, chat_id, action): pass
+
+    def command(self, text):
+        m = SimpleNamespace(text=text, chat=SimpleNamespace(id=1), from_user=SimpleNamespace(id=1))
+        self.handlers[text.split()[0].lstrip('/')](m)
+
+# ---------------------------------------------------------
+# 실행
+# ---------------------------------------------------------
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def make_tickers(n):
+    return [f"T{i:04d}" for i in range(n)]
+
+
+def setup_engine(d, n, args, workdir):
+    """n개 종목 구성으로 엔진 전역 객체를 새로 만들고 외부 호출을 가짜로 연결"""
+    upstream = Upstream(args.latency, args.error_rate, args.seed)
+    tickers = make_tickers(n)
+    transport = FakeTransport(upstream)
+    yahoo = FakeYahoo(upstream, tickers, args.seed)
+    d.metrics = d.Metrics()
+    d.http = d.HttpClient(); d.http.transport = transport
+    d.yf = yahoo
+    d.outbox = d.TelegramOutbox()
+    d.translations = d.TranslationCache(os.path.join(workdir, f"translations_{n}.json"))
+    d.translations.translator = FakeTranslator(upstream)
+    d.news_index = d.NewsDedupIndex(os.path.join(workdir, f"news_seen_{n}.json"))
+    d.finviz = d.FinvizClient()
+    d.market = d.MarketSnapshot(d.OhlcvStore(os.path.join(workdir, f"ohlcv_{n}.db")))
+    d.eco_calendar = d.EconomicCalendar()
+    d.eco_releases = d.EcoReleaseScheduler()
+    d.lookups = d.LookupCache()
+    for cache in (d.price_alert_cache, d.rsi_alert_status, d.eco_alert_cache, d.signal_alert_cache): cache.clear()
+    d.state_store = d.StateStore(os.path.join(workdir, f"state_{n}.db"))
+    d.config_store = d.ConfigStore()
+    # 기본 채팅방은 전 종목, 추가 구독자는 각자 절반씩 (겹치는 종목은 한 번만 받아야 함)
+    rng = random.Random(args.seed)
+    d.config_store.data = {"schema": d.CONFIG_SCHEMA, "option_keys": list(d.OPTION_KEYS), "system_active": True, "eco_mode": True,
+                           "telegram": {"bot_token": "bench", "chat_id": "1"},
+                           "tickers": dict.fromkeys(tickers, d.ALL_MASK),
+                           "subscribers": {str(1000 + i): {"eco_mode": True, "tickers": dict.fromkeys(rng.sample(tickers, n // 2), d.ALL_MASK)}
+                                           for i in range(args.chats - 1)}}
+    bot = FakeBot(d)
+    d.register_bot_handlers(bot)
+    return SimpleNamespace(upstream=upstream, transport=transport, yahoo=yahoo, bot=bot, tickers=tickers)
+
+
+def run_cycle(d, sched):
+    """모니터 작업을 start_monitor와 같은 함수로 한 번씩 실행 -> 단계별 소요 시간"""
+    async def run_async(fn):
+        sched.loop = asyncio.get_running_loop(); sched.semaphores = {}
+        await fn(sched)
+    stages = {}
+    for name, fn in (('prices', d.monitor_prices),
+                     ('news', lambda: asyncio.run(run_async(d.monitor_news))),
+                     ('finviz', lambda: asyncio.run(run_async(d.monitor_finviz))),
+                     ('eco', d.monitor_eco)):
+        t0 = time.perf_counter(); fn(); stages[name] = time.perf_counter() - t0
+    return stages
+
+
+def drain_outbox(d, timeout):
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        if d.outbox.stats()['depth'] == 0: break
+        time.sleep(0.2)
+    return time.perf_counter() - t0
+
+
+def bench_scale(d, n, args, workdir, out):
+    env = setup_engine(d, n, args, workdir)
+    sched = d.Scheduler()
+    if not args.no_tracemalloc: tracemalloc.start()
+    out(f"\n== {n} tickers | {args.chats} chats | {args.cycles} cycles | latency {args.latency * 1000:.0f}ms | error rate {args.error_rate:.1%} ==")
+    out(f"{'cycle':>5} {'total':>8} {'prices':>8} {'news':>8} {'finviz':>8} {'eco':>8}  requests by host")
+    totals = []
+    for c in range(1, args.cycles + 1):
+        before = env.upstream.counts()
+        t0 = time.perf_counter()
+        stages = run_cycle(d, sched)
+        total = time.perf_counter() - t0; totals.append(total)
+        after = env.upstream.counts()
+        diff = {h: after.get(h, 0) - before.get(h, 0) for h in after if after.get(h, 0) - before.get(h, 0)}
+        reqs = ", ".join(f"{HOST_LABELS.get(h, h)}={v}" for h, v in sorted(diff.items()))
+        out(f"{c:>5} {total:>7.2f}s " + " ".join(f"{stages[s]:>7.2f}s" for s in ('prices', 'news', 'finviz', 'eco'))
+            + f"  {sum(diff.values())} ({reqs})")
+
+    out(f"{'command':>9} {'avg':>8} {'p95':>8} {'req/call':>9}")
+    sample = env.tickers[:BENCH_COMMAND_SAMPLES]
+    for cmd in BENCH_COMMANDS:
+        targets = sample if cmd not in ('eco', 'list') else [None] * min(5, len(sample))
+        times = []; before = sum(env.upstream.counts().values())
+        for t in targets:
+            t0 = time.perf_counter(); env.bot.command(f"/{cmd} {t}" if t else f"/{cmd}"); times.append(time.perf_counter() - t0)
+        per_call = (sum(env.upstream.counts().values()) - before) / len(targets)
+        out(f"{'/' + cmd:>9} {np.mean(times) * 1000:>6.1f}ms {percentile(times, 0.95) * 1000:>6.1f}ms {per_call:>9.1f}")
+
+    # 같은 종목을 여러 명이 동시에 물어보는 경우: 캐시를 비우고 동시에 쏴서 외부 호출이 한 번으로 합쳐지는지
+    out(f"{'burst':>9} {'calls':>6} {'wall':>8} {'upstream':>9}")
+    t = env.tickers[-1]
+    for cmd in ('p', 'summary', 'earning', 'news', 'sec'):
+        d.lookups = d.LookupCache(); d.finviz = d.FinvizClient(); d.market.fetched.pop(t, None)
+        before = env.upstream.counts(); t0 = time.perf_counter()
+        threads = [threading.Thread(target=env.bot.command, args=(f"/{cmd} {t}",)) for _ in range(BENCH_BURST)]
+        for th in threads: th.start()
+        for th in threads: th.join()
+        after = env.upstream.counts()
+        fetched = sum(v - before.get(h, 0) for h, v in after.items() if h != 'api.telegram.org')
+        out(f"{'/' + cmd:>9} {BENCH_BURST:>6} {(time.perf_counter() - t0) * 1000:>6.1f}ms {fetched:>9}")
+
+    if not args.no_tracemalloc:
+        _, peak = tracemalloc.get_traced_memory(); tracemalloc.stop()
+        out(f"peak memory (tracemalloc): {peak / 2**20:.1f} MiB")
+    drained = drain_outbox(d, args.drain)
+    q = d.outbox.stats()
+    out(f"alerts: enqueued {q['enqueued']}, sent {q['sent']} in {q['messages']} messages, failed {q['failed']}, "
+        f"retries {q['retries']}, left {q['depth']} (drained {drained:.1f}s)")
+    out(f"alert delivery latency: avg {q['latency_avg']:.2f}s, p95 {q['latency_p95']:.2f}s")
+    out(f"cycle time: first {totals[0]:.2f}s, steady avg {np.mean(totals[1:] or totals):.2f}s")
+    if args.metrics:
+        out(f"{'engine metrics':<34} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for (kind, name), v in d.metrics.snapshot().items():
+            if kind in ('stage', 'http') and v['timed']:
+                out(f"{kind + ' ' + name:<34} {v['count']:>7} " + " ".join(f"{v[q] * 1000:>6.1f}ms" for q in ('p50', 'p95', 'p99')))
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument('--tickers', type=int, nargs='+', default=[10, 100, 1000], help="종목 수 (여러 개 가능)")
+    p.add_argument('--chats', type=int, default=1, help="구독 채팅방 수 (기본 채팅방 포함)")
+    p.add_argument('--cycles', type=int, default=3, help="모니터 사이클 반복 수")
+    p.add_argument('--latency', type=float, default=0.02, help="가짜 서버 평균 응답 지연(초)")
+    p.add_argument('--error-rate', type=float, default=0.0, help="가짜 서버 실패 확률 (0~1)")
+    p.add_argument('--drain', type=float, default=60.0, help="알림 큐가 빌 때까지 기다릴 최대 초")
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--no-tracemalloc', action='store_true', help="메모리 추적 끄기 (추적 오버헤드 제거)")
+    p.add_argument('--metrics', action='store_true', help="엔진 자체 지표(단계/호스트별 분위수)도 출력")
+    p.add_argument('--out', help="결과를 이 파일에도 기록")
+    args = p.parse_args(argv)
+
+    out = Report()
+    workdir = enter_workdir("debrief_bench_")
+    t0 = time.perf_counter()
+    import debrief as d
+    out(f"import debrief: {time.perf_counter() - t0:.2f}s (workdir {workdir})")
+    for n in args.tickers: bench_scale(d, n, args, workdir, out)
+    out.save(args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2812 @@
+import time
+PROCESS_STARTED = time.perf_counter()
+import streamlit as st
+import json
+import os
+import sys
+import signal
+import argparse
+import copy
+import atexit
+import sqlite3
+import asyncio
+import random
+import re
+import hashlib
+import heapq
+import functools
+import itertools
+import importlib
+import queue
+import requests
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit, urlunsplit
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+try: import fcntl
+except ImportError: fcntl = None   # Windows: 워커 잠금 없이 단일 프로세스로 가정
+
+# --- 무거운 의존성은 처음 쓰는 순간 import (콜드 스타트/첫 화면이 데이터 스택을 기다리지 않도록) ---
+IMPORT_TIMES = {}    # 모듈 -> import 소요 초 (시작 로그, 지표 stage import.*)
+LAZY_MODULES = {}
+
+class LazyModule:
+    """첫 속성 접근 때 실제로 import 하는 모듈 대리 객체. 소요 시간은 IMPORT_TIMES와 로그에 남김"""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+        LAZY_MODULES[name] = self
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    t0 = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    IMPORT_TIMES[self._name] = elapsed = time.perf_counter() - t0
+                    self._module = module
+                    metrics.observe('stage', f"import.{self._name}", elapsed)
+                    write_log(f"지연 import: {self._name}", stage="startup", duration=elapsed)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'{' (loaded)' if self._module else ''}>"
+
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+yf = LazyModule('yfinance')
+telebot = LazyModule('telebot')
+cloudscraper = LazyModule('cloudscraper')
+lxml_html = LazyModule('lxml.html')
+deep_translator = LazyModule('deep_translator')
+WARM_IMPORTS = ('numpy', 'pandas', 'yfinance', 'lxml.html', 'cloudscraper', 'deep_translator')
+
+def warm_imports(names=WARM_IMPORTS):
+    """데이터 스택을 백그라운드 스레드에서 미리 import. 화면 골격/가벼운 봇 명령은 이를 기다리지 않음"""
+    def run():
+        for name in names:
+            try: LAZY_MODULES[name]._load()
+            except Exception as e: write_log(f"Import Err: {name}: {e}", "ERROR", stage="startup")
+    t = threading.Thread(target=run, daemon=True, name="DeBrief_Warmup")
+    t.start()
+    return t
+
+# --- 프로젝트 설정 ---
+CONFIG_FILE = 'debrief_settings.json'
+LOG_FILE = 'debrief.log'                  # Streamlit 프로세스 (UI, 워커를 같이 돌릴 때는 워커 포함)
+LOG_WORKER_FILE = 'debrief_worker.log'    # 독립 워커 프로세스 (python -m debrief worker)
+LOG_FILES = (LOG_FILE, LOG_WORKER_FILE)   # 파일마다 기록/회전하는 프로세스는 하나. Logs 탭은 합쳐서 읽음
+TRANSLATION_FILE = 'debrief_translations.json'
+OHLCV_DB_FILE = 'debrief_ohlcv.db'
+NEWS_SEEN_FILE = 'debrief_news_seen.json'
+STATE_DB_FILE = 'debrief_state.db'
+WORKER_LOCK_FILE = 'debrief_worker.lock'
+
+# [State] 알림 이력 (모듈 전역, 워커 프로세스에 하나. 공유 상태 저장소에 영속)
+alert_lock = threading.RLock()
+price_alert_cache = {}   # ticker -> [마지막 급등락 알림 %, 날짜]. 날짜가 바뀌면 기준 초기화
+rsi_alert_status = {}
+eco_alert_cache = set()
+signal_alert_cache = {}
+
+# ---------------------------------------------------------
+# [0] 로그 기록 (큐 + 백그라운드 기록 + 크기/시간 회전)
+# ---------------------------------------------------------
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARN', 'ERROR')
+LOG_MIN_LEVEL = 'INFO'            # 이보다 낮은 레벨은 기록하지 않음
+LOG_MAX_BYTES = 2 * 1024 * 1024   # 이 크기를 넘으면 회전
+LOG_ROTATE_INTERVAL = 86400       # 초. 파일을 시작한 지 이만큼 지나면 회전
+LOG_BACKUPS = 5                   # debrief.log.1 ~ .5 보관
+LOG_QUEUE_SIZE = 10000            # 가득 차면 새 줄은 버림 (호출 스레드를 막지 않음)
+LOG_BATCH = 500                   # 한 번에 기록할 최대 줄 수
+LOG_TAIL_BLOCK = 8192             # tail_log가 파일 끝에서 거슬러 읽는 단위
+LOG_TAIL_MAX_BYTES = 2 * 1024 * 1024
+LOG_LINE_RE = re.compile(r"^\[(?P<ts>[^\]]+)\] (?:(?P<level>DEBUG|INFO|WARN|ERROR) +)?(?P<msg>.*?)(?: \| (?P<fields>(?:\w+=\S+ ?)+))?$")
+
+class LogWriter:
+    """write_log가 줄을 넣는 큐와, 그것을 모아 파일에 쓰는 스레드 하나.
+
+    파일은 열어 둔 채로 묶음 단위로 기록하고, LOG_MAX_BYTES 또는 LOG_ROTATE_INTERVAL을
+    넘기면 debrief.log -> .1 -> .2 ... 순으로 밀어 LOG_BACKUPS개만 남긴다.
+    회전은 파일을 연 프로세스 혼자 하므로 프로세스마다 다른 파일을 쓴다 (LOG_FILES).
+    """
+    def __init__(self, path=LOG_FILE, max_bytes=LOG_MAX_BYTES, interval=LOG_ROTATE_INTERVAL, backups=LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backups = backups
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.file = None
+        self.started = 0.0
+        self.dropped = 0
+
+    def write(self, line):
+        try: self.queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, daemon=True, name="DeBrief_Log")
+                    self.thread.start()
+
+    def _open(self):
+        self.file = open(self.path, 'a', encoding='utf-8')
+        # 이어 쓰는 파일은 마지막 기록 시각부터 회전 주기를 셈
+        self.started = os.path.getmtime(self.path) if self.file.tell() else time.time()
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"): os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        self._open()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < LOG_BATCH:
+                try: batch.append(self.queue.get_nowait())
+                except queue.Empty: break
+            text = "\n".join(batch)
+            print(text)
+            try:
+                if self.file is None: self._open()
+                self.file.write(text + "\n"); self.file.flush()
+                if self.file.tell() >= self.max_bytes or time.time() - self.started >= self.interval: self._rotate()
+            except Exception:
+                self.file = None
+            for _ in batch: self.queue.task_done()
+
+    def flush(self, timeout=2.0):
+        """큐가 빌 때까지 잠시 대기 (종료 시)"""
+        deadline = time.time() + timeout
+        while self.queue.unfinished_tasks and time.time() < deadline: time.sleep(0.02)
+
+log_writer = LogWriter(LOG_WORKER_FILE if __name__ == '__main__' else LOG_FILE)   # 스크립트 실행은 독립 워커뿐
+atexit.register(log_writer.flush)
+
+def format_log_fields(fields):
+    return " ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in fields.items() if v is not None)
+
+def write_log(msg, level='INFO', **fields):
+    """한 줄 기록 (큐에 넣고 바로 반환). fields는 ticker, stage, duration 등 '키=값'으로 덧붙임"""
+    if LOG_LEVELS.index(level) < LOG_LEVELS.index(LOG_MIN_LEVEL): return
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    extra = format_log_fields(fields)
+    log_writer.write(f"[{timestamp}] {level:<5} {msg}" + (f" | {extra}" if extra else ""))
+
+def parse_log_line(line):
+    """'[시각] 레벨 메시지 | 키=값 ...' -> dict. 레벨 없는 예전 형식은 INFO"""
+    m = LOG_LINE_RE.match(line)
+    if not m: return {'ts': "", 'level': 'INFO', 'msg': line, 'fields': {}}
+    fields = dict(kv.split('=', 1) for kv in (m['fields'] or "").split())
+    return {'ts': m['ts'], 'level': m['level'] or 'INFO', 'msg': m['msg'], 'fields': fields}
+
+def log_matches(rec, levels=None, ticker=None):
+    if levels and rec['level'] not in levels: return False
+    if ticker:
+        return rec['fields'].get('ticker') == ticker or re.search(rf"\b{re.escape(ticker)}\b", rec['msg']) is not None
+    return True
+
+def tail_log(paths=LOG_FILES, n=50, levels=None, ticker=None, max_bytes=LOG_TAIL_MAX_BYTES):
+    """로그 파일(들)에서 조건에 맞는 최근 n줄 (최신순). 여러 파일이면 시각 순으로 합침"""
+    if isinstance(paths, str): return tail_log_file(paths, n, levels, ticker, max_bytes)
+    def keyed(path):
+        # 시각 없는 줄(여러 줄 메시지의 뒷줄)은 바로 앞 기록의 시각을 따라감
+        lines = tail_log_file(path, n, levels, ticker, max_bytes); keys = []; ts = ""
+        for line in reversed(lines):
+            if line.startswith('['): ts = line[1:20]
+            keys.append(ts)
+        return list(zip(reversed(keys), lines))
+    merged = heapq.merge(*(keyed(p) for p in paths), key=lambda x: x[0], reverse=True)
+    return [line for _, line in itertools.islice(merged, n)]
+
+def tail_log_file(path, n=50, levels=None, ticker=None, max_bytes=LOG_TAIL_MAX_BYTES):
+    """파일 끝에서 블록 단위로 거슬러 읽어 조건에 맞는 최근 n줄 (최신순).
+
+    파일 크기와 관계없이 필요한 만큼만(최대 max_bytes) 읽는다.
+    """
+    out = []
+    try: f = open(path, 'rb')
+    except OSError: return out
+    with f:
+        pos = f.seek(0, os.SEEK_END); buf = b""; read = 0
+        def take(raw):
+            line = raw.decode('utf-8', errors='replace').rstrip('\r')
+            if line and log_matches(parse_log_line(line), levels, ticker): out.append(line)
+            return len(out) >= n
+        while pos > 0 and read < max_bytes:
+            step = min(LOG_TAIL_BLOCK, pos); pos -= step; read += step
+            f.seek(pos)
+            lines = (f.read(step) + buf).split(b"\n")
+            buf = lines[0]  # 블록 경계에서 잘렸을 수 있는 첫 줄은 다음 블록과 합침
+            for raw in reversed(lines[1:]):
+                if take(raw): return out
+        if pos == 0 and buf: take(buf)
+    return out
+
+# ---------------------------------------------------------
+# [0-1] HTTP 클라이언트 (호스트별 세션 풀 + 조건부 GET)
+# ---------------------------------------------------------
+HTTP_POOL_SIZE = 10          # 호스트당 keep-alive 연결 수
+HTTP_VALIDATOR_LIMIT = 2000  # ETag/Last-Modified를 기억할 URL 수
+HTTP_SCRAPER_HOSTS = {'finviz.com', 'nfs.faireconomy.media'}  # cloudscraper 세션이 필요한 호스트
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+YAHOO_HOST = 'query1.finance.yahoo.com'   # yfinance 호출을 묶어 세는 호스트 이름
+BREAKER_FAILURES = 5          # 연속 실패 몇 번이면 호스트 차단
+BREAKER_BASE_DELAY = 30.0     # 초. 첫 차단 시간, 시험 요청이 다시 실패할 때마다 2배
+BREAKER_MAX_DELAY = 1800.0
+BREAKER_FAIL_STATUS = {403, 429, 500, 502, 503, 504}   # 차단/과부하로 보는 응답
+BREAKER_EXEMPT_HOSTS = {'api.telegram.org'}   # 발송 큐가 자체 재시도/속도 제한을 함
+
+class CircuitOpenError(requests.ConnectionError):
+    """차단 중인 호스트로 가는 요청. 기존 네트워크 오류 처리 경로를 그대로 타도록 ConnectionError 하위"""
+
+class CircuitBreaker:
+    """호스트 하나의 차단기.
+
+    closed에서 연속 BREAKER_FAILURES번 실패하면 open: 대기 시간 동안 요청을 보내지 않고 바로 거절한다.
+    대기가 끝나면 half_open으로 시험 요청 하나만 통과시켜 성공하면 closed, 실패하면 대기를 2배로 늘려 다시 open.
+    """
+    def __init__(self, host, failures=BREAKER_FAILURES, base_delay=BREAKER_BASE_DELAY, max_delay=BREAKER_MAX_DELAY):
+        self.host = host
+        self.threshold = failures
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.state = 'closed'
+        self.since = time.time()
+        self.failures = 0        # 연속 실패 수
+        self.trips = 0           # 복구 없이 연달아 열린 횟수 (대기 시간 지수)
+        self.retry_at = 0.0
+        self.probing = False     # half_open 시험 요청이 나가 있는지
+        self.rejected = 0
+        self.last_error = None
+
+    def _set(self, state):
+        self.state = state; self.since = time.time()
+
+    def allow(self):
+        """요청을 보내도 되면 True. open 대기가 끝났으면 이 호출이 시험 요청이 됨"""
+        with self.lock:
+            if self.state == 'closed': return True
+            if self.state == 'open' and time.time() >= self.retry_at: self._set('half_open'); self.probing = False
+            if self.state == 'half_open' and not self.probing:
+                self.probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def available(self):
+        """거절 수를 세지 않고 지금 요청이 통과할지만 확인 (백그라운드 작업이 회차를 건너뛸지 판단)"""
+        with self.lock:
+            return self.state == 'closed' or (self.state == 'open' and time.time() >= self.retry_at) or \
+                (self.state == 'half_open' and not self.probing)
+
+    def success(self):
+        with self.lock:
+            recovered = self.state != 'closed'
+            self.failures = 0; self.trips = 0; self.probing = False
+            if recovered: self._set('closed')
+        if recovered: write_log(f"회로 복구: {self.host}", stage="http")
+
+    def failure(self, error):
+        with self.lock:
+            self.failures += 1; self.last_error = str(error)[:200]; self.probing = False
+            # 이미 열려 있으면(차단 전에 나간 요청의 늦은 실패) 대기를 다시 늘리지 않음
+            if self.state == 'open' or (self.state == 'closed' and self.failures < self.threshold): return
+            self.trips += 1
+            delay = min(self.base_delay * 2 ** (self.trips - 1), self.max_delay)
+            self.retry_at = time.time() + delay
+            self._set('open')
+        metrics.count('breaker', self.host)
+        write_log(f"회로 차단: {self.host} {delay:.0f}초 ({self.last_error})", "WARN", stage="http", duration=delay)
+
+    def snapshot(self):
+        with self.lock:
+            return {'state': self.state, 'since': self.since, 'failures': self.failures, 'trips': self.trips,
+                    'retry_in': max(0.0, self.retry_at - time.time()) if self.state == 'open' else 0.0,
+                    'rejected': self.rejected, 'last_error': self.last_error}
+
+class HttpClient:
+    """모든 외부 호출이 공유하는 HTTP 계층.
+
+    호스트마다 Session 하나(연결 풀)를 재사용하고, get_cached()는 ETag/If-Modified-Since로
+    재검증해 304면 이전 파싱 결과를 그대로 돌려준다. 호스트별 요청 수/304 수/절약 바이트를 집계.
+    호스트마다 CircuitBreaker를 두어 차단 중에는 타임아웃을 기다리지 않고 CircuitOpenError로 바로 실패한다.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.breakers = {}
+        self.validators = OrderedDict()  # url -> {'etag', 'last_modified', 'parsed', 'length'}
+        self.stats = {}
+        self.transport = None            # 대체 전송 함수 (method, url, **kw) -> Response. 벤치마크용
+
+    def session(self, host, scraper=False):
+        key = (host, scraper)
+        with self.lock:
+            if key not in self.sessions:
+                if scraper:
+                    # cloudscraper의 CipherSuiteAdapter(Cloudflare 우회용 TLS 설정)는 그대로 두고 풀 크기만 맞춤
+                    s = cloudscraper.create_scraper()
+                    s.adapters["https://"].init_poolmanager(1, HTTP_POOL_SIZE)
+                else:
+                    s = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+                    s.mount("https://", adapter); s.mount("http://", adapter)
+                self.sessions[key] = s
+            return self.sessions[key]
+
+    def _count(self, host, **inc):
+        with self.lock:
+            st_ = self.stats.setdefault(host, {'requests': 0, 'not_modified': 0, 'errors': 0, 'rejected': 0, 'stale': 0,
+                                               'bytes': 0, 'bytes_saved': 0})
+            for k, v in inc.items(): st_[k] += v
+
+    def breaker(self, host):
+        with self.lock:
+            if host not in self.breakers: self.breakers[host] = CircuitBreaker(host)
+            return self.breakers[host]
+
+    def _admit(self, host):
+        """차단기를 통과하면 차단기(면제 호스트는 None), 차단 중이면 CircuitOpenError"""
+        if host in BREAKER_EXEMPT_HOSTS: return None
+        br = self.breaker(host)
+        if not br.allow():
+            self._count(host, rejected=1)
+            raise CircuitOpenError(f"{host} circuit open")
+        return br
+
+    def request(self, method, url, scraper=None, timeout=5, **kw):
+        host = urlsplit(url).hostname or ""
+        if scraper is None: scraper = host.removeprefix("www.") in HTTP_SCRAPER_HOSTS
+        br = self._admit(host)
+        started = time.perf_counter()
+        try:
+            send = self.transport or self.session(host, scraper).request
+            resp = send(method, url, timeout=timeout, **kw)
+        except Exception as e:
+            self._count(host, requests=1, errors=1)
+            metrics.observe('http', host, time.perf_counter() - started, error=True)
+            if br: br.failure(e)
+            raise
+        self._count(host, requests=1, bytes=len(resp.content))
+        metrics.observe('http', host, time.perf_counter() - started, error=resp.status_code >= 500 or resp.status_code == 429)
+        if br:
+            if resp.status_code in BREAKER_FAIL_STATUS: br.failure(f"HTTP {resp.status_code}")
+            else: br.success()
+        return resp
+
+    def guarded(self, host, fn, *args, check=None, **kw):
+        """HttpClient를 거치지 않는 외부 호출(yfinance 등)도 같은 호스트 차단기를 거치게 함.
+
+        check(결과)가 오류 문자열을 돌려주면 결과는 그대로 반환하되 차단기에는 실패로 셈
+        (yf.download처럼 네트워크 오류를 예외 대신 빈/일부 응답으로 주는 호출용).
+        """
+        br = self._admit(host)
+        try: result = fn(*args, **kw)
+        except Exception as e:
+            if br: br.failure(e)
+            raise
+        error = check(result) if check else None
+        if br and error: br.failure(error)
+        elif br: br.success()
+        return result
+
+    def get(self, url, **kw): return self.request("GET", url, **kw)
+    def post(self, url, **kw): return self.request("POST", url, **kw)
+    def put(self, url, **kw): return self.request("PUT", url, **kw)
+
+    def get_cached(self, url, parse, headers=None, fallback=False, **kw):
+        """조건부 GET. 304(변경 없음)면 parse를 건너뛰고 이전 결과를 반환 (반환값은 수정 금지).
+
+        fallback이면 검증자가 없어도 마지막 결과를 기억해 두고, 요청이 실패하거나 호스트가 차단 중일 때 그것을 돌려준다.
+        """
+        headers = dict(headers or DEFAULT_HEADERS)
+        with self.lock: entry = self.validators.get(url)
+        if entry:
+            if entry['etag']: headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']: headers['If-Modified-Since'] = entry['last_modified']
+        host = urlsplit(url).hostname or ""
+        try:
+            resp = self.get(url, headers=headers, **kw)
+            resp.raise_for_status()
+        except Exception:
+            if not (fallback and entry): raise
+            self._count(host, stale=1)
+            return entry['parsed']
+        if resp.status_code == 304 and entry:
+            self._count(host, not_modified=1, bytes_saved=entry['length'])
+            with self.lock: self.validators.move_to_end(url)
+            return entry['parsed']
+        parsed = parse(resp.content)
+        etag = resp.headers.get('ETag'); last_modified = resp.headers.get('Last-Modified')
+        if etag or last_modified or fallback:
+            with self.lock:
+                self.validators[url] = {'etag': etag, 'last_modified': last_modified, 'parsed': parsed, 'length': len(resp.content)}
+                self.validators.move_to_end(url)
+                while len(self.validators) > HTTP_VALIDATOR_LIMIT: self.validators.popitem(last=False)
+        return parsed
+
+    def stats_snapshot(self):
+        with self.lock: return {h: dict(v) for h, v in self.stats.items()}
+
+    def breakers_snapshot(self):
+        with self.lock: breakers = list(self.breakers.values())
+        return {b.host: b.snapshot() for b in breakers}
+
+http = HttpClient()
+
+# ---------------------------------------------------------
+# [0-2] 텔레그램 발송 큐 (속도 제한 + 묶음 발송 + 재시도)
+# ---------------------------------------------------------
+TELEGRAM_COALESCE_WINDOW = 2.0   # 초. 같은 채팅방 알림을 이 시간 동안 모아 한 메시지로
+TELEGRAM_CHAT_INTERVAL = 1.0     # 개인 채팅 최소 발송 간격
+TELEGRAM_GROUP_INTERVAL = 3.0    # 그룹 채팅(음수 id)은 분당 20건
+TELEGRAM_GLOBAL_RATE = 30        # 봇 전체 초당 발송 한도
+TELEGRAM_MAX_RETRIES = 5
+TELEGRAM_MAX_LEN = 4096
+
+class TelegramOutbox:
+    """모든 알림이 거쳐 가는 단일 발송 큐.
+
+    채팅방(및 parse_mode)별로 TELEGRAM_COALESCE_WINDOW 동안 쌓인 알림을 하나로 묶고,
+    채팅방별/전체 속도 제한을 지키며 보낸다. 429는 retry_after만큼, 그 밖의 실패는
+    지수 백오프로 다시 시도한다. 큐 길이와 적재->발송 지연을 집계한다.
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending = OrderedDict()   # (token, chat_id, parse_mode) -> [(적재 시각, 본문)]
+        self.attempts = {}
+        self.next_at = {}              # chat_id -> 다음 발송 가능 시각
+        self.paused_until = 0.0        # 전체 429 대기
+        self.recent = deque()          # 최근 1초 발송 시각
+        self.latency = deque(maxlen=500)
+        self.counters = {'enqueued': 0, 'sent': 0, 'messages': 0, 'retries': 0, 'failed': 0}
+        self.inflight = 0              # 큐에서 꺼내 발송 중인 항목 수
+        self.thread = None
+
+    def send(self, token, chat_id, text, parse_mode=None):
+        if not token or not chat_id: return
+        with self.cond:
+            self.pending.setdefault((token, str(chat_id), parse_mode), []).append((time.time(), text))
+            self.counters['enqueued'] += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True, name="DeBrief_Outbox")
+                self.thread.start()
+            self.cond.notify()
+
+    def _interval(self, chat_id):
+        return TELEGRAM_GROUP_INTERVAL if chat_id.startswith('-') else TELEGRAM_CHAT_INTERVAL
+
+    def _next_batch(self, now):
+        """지금 보낼 수 있는 묶음 하나, 없으면 (None, 다음 확인까지 대기 시간)"""
+        while self.recent and now - self.recent[0] > 1.0: self.recent.popleft()
+        wait = 1.0
+        gate = max(self.paused_until, self.recent[0] + 1.0 if len(self.recent) >= TELEGRAM_GLOBAL_RATE else 0.0)
+        for key, items in self.pending.items():
+            ready = max(items[0][0] + TELEGRAM_COALESCE_WINDOW, self.next_at.get(key[1], 0.0), gate)
+            if ready <= now:
+                del self.pending[key]
+                return (key, items), 0.0
+            wait = min(wait, ready - now)
+        return None, wait
+
+    def _run(self):
+        while True:
+            with self.cond:
+                batch, wait = self._next_batch(time.time())
+                if batch is None:
+                    self.cond.wait(timeout=wait)
+                    continue
+                key = batch[0]
+                self.recent.append(time.time())
+                self.next_at[key[1]] = time.time() + self._interval(key[1])
+                self.inflight += len(batch[1])
+            try: self._deliver(*batch)
+            finally:
+                with self.cond: self.inflight -= len(batch[1])
+
+    def _chunks(self, items):
+        """본문을 4096자 이하 메시지로 묶음 -> [(메시지, 포함된 항목 수)]"""
+        out, cur, n = [], "", 0
+        for _, t in items:
+            t = t[:TELEGRAM_MAX_LEN]
+            if cur and len(cur) + len(t) + 2 > TELEGRAM_MAX_LEN: out.append((cur, n)); cur, n = "", 0
+            cur = f"{cur}\n\n{t}" if cur else t; n += 1
+        if cur: out.append((cur, n))
+        return out
+
+    def _post(self, token, chat_id, text, parse_mode):
+        """성공이면 None, 실패면 재시도까지 기다릴 초"""
+        data = {"chat_id": chat_id, "text": text}
+        if parse_mode: data["parse_mode"] = parse_mode
+        url = f"https://api.telegram.org/bot{token}/sendMessage"
+        try:
+            resp = http.post(url, data=data, timeout=10)
+            if resp.status_code == 400 and parse_mode:
+                # 마크다운 파싱 실패 -> 서식 없이 한 번 더
+                resp = http.post(url, data={"chat_id": chat_id, "text": text}, timeout=10)
+            if resp.status_code == 200: return None
+            if resp.status_code == 429:
+                try: return float(resp.json()['parameters']['retry_after'])
+                except Exception: return 5.0
+        except Exception: pass
+        return min(60.0, 2.0 ** self.attempts.get((token, chat_id, parse_mode), 0))
+
+    def _deliver(self, key, items):
+        """첫 메시지 분량만 보내고 남은 항목은 채팅방 발송 간격 뒤로 되돌림"""
+        text, n = self._chunks(items)[0]
+        delay = self._post(*key[:2], text, key[2])
+        if delay is not None:
+            self._retry(key, items, delay)
+            return
+        with self.cond:
+            self.counters['messages'] += 1
+            if items[n:]:
+                self.pending[key] = items[n:] + self.pending.get(key, [])
+                self.pending.move_to_end(key, last=False)
+        self._finish(key, items[:n])
+
+    def _finish(self, key, items):
+        if not items: return
+        now = time.time()
+        with self.cond:
+            self.attempts.pop(key, None)
+            self.counters['sent'] += len(items)
+            self.latency.extend(now - ts for ts, _ in items)
+        for ts, _ in items: metrics.observe('delivery', 'telegram', now - ts)
+
+    def _retry(self, key, items, delay):
+        with self.cond:
+            n = self.attempts.get(key, 0) + 1
+            if n > TELEGRAM_MAX_RETRIES:
+                self.attempts.pop(key, None)
+                self.counters['failed'] += len(items)
+                metrics.observe('delivery', 'telegram', error=True, n=len(items))
+                write_log(f"Telegram 발송 실패 ({key[1]}): {len(items)}건 폐기", "ERROR", stage="telegram")
+                return
+            self.attempts[key] = n
+            self.counters['retries'] += 1
+            self.next_at[key[1]] = time.time() + delay
+            if delay > 5: self.paused_until = max(self.paused_until, time.time() + delay)
+            self.pending[key] = items + self.pending.get(key, [])
+            self.pending.move_to_end(key, last=False)
+            self.cond.notify()
+
+    def stats(self):
+        with self.cond:
+            lat = sorted(self.latency)
+            depth = sum(len(v) for v in self.pending.values()) + self.inflight
+            out = dict(self.counters, depth=depth)
+        out['latency_avg'] = sum(lat) / len(lat) if lat else 0.0
+        out['latency_p95'] = lat[int(len(lat) * 0.95)] if lat else 0.0
+        return out
+
+outbox = TelegramOutbox()
+
+def send_telegram(token, chat_id, text, parse_mode=None):
+    """알림 발송 (큐에 적재, 실제 전송은 TelegramOutbox 스레드)"""
+    outbox.send(token, chat_id, text, parse_mode)
+
+# ---------------------------------------------------------
+# [0-3] 실행 지표 (호스트/단계/명령어/규칙별 횟수 + 지연 분포)
+# ---------------------------------------------------------
+METRICS_SAMPLES = 1000              # 키마다 보관할 최근 측정값 수 (분위수 계산용)
+METRICS_QUANTILES = (0.5, 0.95, 0.99)
+METRICS_PORT = 9464                 # Prometheus 텍스트 엔드포인트 (127.0.0.1 전용)
+METRIC_KINDS = {'stage': "모니터 단계", 'http': "외부 호스트", 'breaker': "호스트 차단", 'command': "봇 명령어",
+                'cache': "명령어 캐시", 'rule': "규칙 평가", 'alert': "규칙별 알림", 'delivery': "알림 발송 지연"}
+
+def _quantile(values, q):
+    """정렬된 목록의 q 분위수"""
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+class Metrics:
+    """(종류, 이름)별 누적 횟수/오류 수/소요 시간 합계와 최근 METRICS_SAMPLES개 측정값.
+
+    종류는 METRIC_KINDS 참고 (http는 호스트, stage는 모니터 단계, command는 봇 명령어,
+    rule/alert는 규칙). /stats, Metrics 탭, Prometheus 엔드포인트가 모두 snapshot()을 읽는다.
+    """
+    def __init__(self, samples=METRICS_SAMPLES):
+        self.lock = threading.Lock()
+        self.samples = samples
+        self.series = {}   # (kind, name) -> {'count', 'errors', 'timed', 'sum', 'recent'}
+
+    def observe(self, kind, name, seconds=None, error=False, n=1):
+        with self.lock:
+            s = self.series.get((kind, name))
+            if s is None:
+                s = self.series[(kind, name)] = {'count': 0, 'errors': 0, 'timed': 0, 'sum': 0.0, 'recent': deque(maxlen=self.samples)}
+            s['count'] += n
+            if error: s['errors'] += 1
+            if seconds is not None:
+                s['timed'] += 1; s['sum'] += seconds; s['recent'].append(seconds)
+
+    def count(self, kind, name, n=1):
+        self.observe(kind, name, n=n)
+
+    @contextmanager
+    def timer(self, kind, name):
+        started = time.perf_counter(); failed = False
+        try: yield
+        except BaseException:
+            failed = True
+            raise
+        finally: self.observe(kind, name, time.perf_counter() - started, error=failed)
+
+    def snapshot(self, kind=None):
+        """{(kind, name): {'count', 'errors', 'timed', 'sum', 'avg', 'p50', 'p95', 'p99'}} (초 단위)"""
+        with self.lock:
+            items = [(k, dict(v, recent=sorted(v['recent']))) for k, v in self.series.items() if kind in (None, k[0])]
+        out = {}
+        for key, s in sorted(items):
+            lat = s.pop('recent')
+            s['avg'] = s['sum'] / s['timed'] if s['timed'] else 0.0
+            for q in METRICS_QUANTILES: s[f"p{int(q * 100)}"] = _quantile(lat, q)
+            out[key] = s
+        return out
+
+    def prometheus(self):
+        """Prometheus 텍스트 형식 (events/errors 카운터 + 소요 시간 summary)"""
+        snap = self.snapshot()
+        label = lambda k: 'kind="%s",name="%s"' % (k[0], str(k[1]).replace('\\', '\\\\').replace('"', '\\"'))
+        lines = ["# HELP debrief_events_total Calls, requests or alerts by kind and name.",
+                 "# TYPE debrief_events_total counter"]
+        lines += [f"debrief_events_total{{{label(k)}}} {s['count']}" for k, s in snap.items()]
+        lines += ["# HELP debrief_errors_total Failed calls by kind and name.", "# TYPE debrief_errors_total counter"]
+        lines += [f"debrief_errors_total{{{label(k)}}} {s['errors']}" for k, s in snap.items()]
+        lines += ["# HELP debrief_duration_seconds Duration of timed calls (quantiles over recent samples).",
+                  "# TYPE debrief_duration_seconds summary"]
+        for k, s in snap.items():
+            if not s['timed']: continue
+            for q in METRICS_QUANTILES:
+                lines.append(f'debrief_duration_seconds{{{label(k)},quantile="{q}"}} {s[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f"debrief_duration_seconds_sum{{{label(k)}}} {s['sum']:.6f}")
+            lines.append(f"debrief_duration_seconds_count{{{label(k)}}} {s['timed']}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+def metrics_text():
+    """엔드포인트 응답: 지표 + 현재 상태 게이지"""
+    q = outbox.stats()
+    gauges = ["# TYPE debrief_outbox_depth gauge", f"debrief_outbox_depth {q['depth']}",
+              "# TYPE debrief_snapshot_age_seconds gauge", f"debrief_snapshot_age_seconds {market.age() or 0:.1f}",
+              "# TYPE debrief_breaker_open gauge"]
+    gauges += [f'debrief_breaker_open{{host="{h}"}} {int(b["state"] != "closed")}' for h, b in http.breakers_snapshot().items()]
+    return metrics.prometheus() + "\n".join(gauges) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if urlsplit(self.path).path != '/metrics':
+            self.send_error(404); return
+        body = metrics_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args): pass
+
+def start_metrics_server(port=METRICS_PORT):
+    """http://127.0.0.1:{port}/metrics 를 백그라운드 스레드에서 제공. 포트가 사용 중이면 생략"""
+    try: server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+    except OSError as e:
+        write_log(f"Metrics 엔드포인트 시작 실패 (:{port}): {e}", "WARN", stage="metrics")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True, name="DeBrief_Metrics").start()
+    return server
+
+# ---------------------------------------------------------
+# [0-4] 공유 상태 저장소 (워커 프로세스 <-> Streamlit UI 프로세스)
+# ---------------------------------------------------------
+WORKER_STATUS_INTERVAL = 5   # 초. 워커가 상태를 게시하는 주기
+WORKER_STALE_AFTER = 30      # 초. 이보다 오래된 게시는 워커 중단으로 간주
+
+class StateStore:
+    """프로세스 간 공유 상태 (SQLite key -> JSON).
+
+    설정 원본, 알림 이력, 워커 상태 게시를 담는다. 키마다 쓸 때마다 rev가 1씩 올라
+    다른 프로세스는 rev만 읽어 변경을 감지한다. WAL 모드라 읽기가 쓰기를 막지 않는다.
+    """
+    def __init__(self, path=STATE_DB_FILE):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, rev INTEGER, updated REAL)")
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE: 다른 프로세스의 쓰기를 막은 채 읽고-고치고-쓰기"""
+        with self.lock:
+            if self.conn.in_transaction:
+                yield self; return
+            self.conn.execute("BEGIN IMMEDIATE")
+            try: yield self
+            except BaseException:
+                self.conn.execute("ROLLBACK"); raise
+            self.conn.execute("COMMIT")
+
+    def get(self, key):
+        """(값, rev). 없으면 (None, 0)"""
+        with self.lock: row = self.conn.execute("SELECT value, rev FROM kv WHERE key=?", (key,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else (None, 0)
+
+    def rev(self, key):
+        with self.lock: row = self.conn.execute("SELECT rev FROM kv WHERE key=?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def put(self, key, value):
+        """기록하고 새 rev를 반환"""
+        body = json.dumps(value, ensure_ascii=False, default=str)
+        with self.transaction():
+            self.conn.execute("""INSERT INTO kv VALUES (?, ?, 1, ?) ON CONFLICT(key)
+                                 DO UPDATE SET value=excluded.value, rev=rev+1, updated=excluded.updated""", (key, body, time.time()))
+            return self.rev(key)
+
+state_store = StateStore()
+
+worker_lock = {'file': None}
+
+def claim_worker():
+    """이 프로세스가 워커(모니터+봇)를 맡음. 다른 프로세스가 이미 맡고 있으면 False"""
+    if worker_lock['file'] is not None or fcntl is None: return True
+    f = open(WORKER_LOCK_FILE, 'a+')
+    try: fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close(); return False
+    f.seek(0); f.truncate(); f.write(str(os.getpid())); f.flush()
+    worker_lock['file'] = f   # 프로세스가 끝날 때까지 열어 둠 (닫히면 잠금 해제)
+    return True
+
+def worker_running():
+    """다른 프로세스가 워커를 맡고 있는지 (잠금 파일 기준, 이 프로세스의 워커는 제외)"""
+    if worker_lock['file'] is not None or fcntl is None: return False
+    try:
+        with open(WORKER_LOCK_FILE, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB); fcntl.flock(f, fcntl.LOCK_UN)
+        return False
+    except OSError: return True
+
+# ---------------------------------------------------------
+# [1] 설정 로드/저장 (자동 마이그레이션 포함)
+# ---------------------------------------------------------
+def get_jsonbin_headers():
+    try:
+        if "jsonbin" in st.secrets:
+            return {'Content-Type': 'application/json', 'X-Master-Key': st.secrets["jsonbin"]["master_key"]}
+    except: pass
+    return None
+
+def get_jsonbin_url():
+    try:
+        if "jsonbin" in st.secrets:
+            bin_id = st.secrets["jsonbin"]["bin_id"]
+            return f"https://api.jsonbin.io/v3/b/{bin_id}"
+    except: pass
+    return None
+
+# [핵심] 아이콘이 포함된 기본 옵션 (복구됨)
+DEFAULT_OPTS = {
+    "🟢 감시": True, 
+    "📰 뉴스": True, 
+    "🏛️ SEC": True, 
+    "📈 급등락(3%)": True,
+    "📊 거래량(2배)": False, 
+    "🚀 신고가": True, 
+    "📉 RSI": False,
+    "〰️ MA크로스": False, 
+    "🛁 볼린저": False, 
+    "🌊 MACD": False
+}
+
+def migrate_options(old_opts):
+    """구버전 키(아이콘 없음)를 신버전(아이콘 있음)으로 자동 변환"""
+    new_opts = DEFAULT_OPTS.copy()
+    # 매핑 테이블 (구 -> 신)
+    mapping = {
+        "감시_ON": "🟢 감시", "뉴스": "📰 뉴스", "SEC": "🏛️ SEC",
+        "가격_3%": "📈 급등락(3%)", "거래량_2배": "📊 거래량(2배)",
+        "52주_신고가": "🚀 신고가", "RSI": "📉 RSI", "MA_크로스": "〰️ MA크로스",
+        "볼린저": "🛁 볼린저", "MACD": "🌊 MACD"
+    }
+    
+    for old_k, val in old_opts.items():
+        if old_k in mapping:
+            new_opts[mapping[old_k]] = val # 구버전 값 승계
+        elif old_k in new_opts:
+            new_opts[old_k] = val # 이미 신버전 키라면 그대로
+            
+    return new_opts
+
+# 설정 스키마 v2: 종목 옵션을 {아이콘 키: bool} dict 대신 비트마스크(int) 하나로 보관.
+# 비트 순서는 option_keys로 함께 저장해 두어, 키가 늘거나 순서가 바뀌어도 이름 기준으로 다시 맞춘다.
+CONFIG_SCHEMA = 2
+OPTION_KEYS = tuple(DEFAULT_OPTS)                            # 0번 비트 = 🟢 감시. 새 옵션은 뒤에 추가
+OPTION_BITS = {k: 1 << i for i, k in enumerate(OPTION_KEYS)}
+ALL_MASK = (1 << len(OPTION_KEYS)) - 1
+
+def options_to_mask(opts):
+    return sum(bit for k, bit in OPTION_BITS.items() if opts.get(k))
+
+def mask_to_options(mask):
+    return {k: bool(mask & bit) for k, bit in OPTION_BITS.items()}
+
+DEFAULT_MASK = options_to_mask(DEFAULT_OPTS)
+
+def option_bits(*keys):
+    return sum(OPTION_BITS[k] for k in keys)
+
+def watchlist_frame(wl):
+    """{티커: 마스크} -> (티커 x 옵션키) bool 프레임 (표 편집/규칙 평가용, 종목별 dict 변환 없이 한 번에)"""
+    masks = np.fromiter(wl.values(), dtype=np.int64, count=len(wl))
+    bits = (masks[:, None] & np.array(list(OPTION_BITS.values()), dtype=np.int64)) != 0
+    return pd.DataFrame(bits, index=list(wl), columns=list(OPTION_KEYS))
+
+def frame_masks(df):
+    """watchlist_frame의 역변환 -> {티커: 마스크}"""
+    weights = np.array([OPTION_BITS[k] for k in df.columns], dtype=np.int64)
+    return dict(zip(df.index, (df.to_numpy(dtype=bool) @ weights).tolist()))
+
+def bulk_add(wl, tickers, mask=DEFAULT_MASK):
+    """없는 종목만 추가. 추가된 종목 목록 (없으면 False -> 저장 생략)"""
+    added = [t for t in dict.fromkeys(tickers) if t and t not in wl]
+    for t in added: wl[t] = mask
+    return added or False
+
+def bulk_remove(wl, tickers):
+    removed = [t for t in dict.fromkeys(tickers) if wl.pop(t, None) is not None]
+    return removed or False
+
+def bulk_set(wl, tickers, bits, on):
+    """tickers의 bits 옵션을 한꺼번에 켜거나 끔. 바뀐 종목 수 (없으면 False)"""
+    changed = 0
+    for t in tickers:
+        if t not in wl: continue
+        new = wl[t] | bits if on else wl[t] & ~bits
+        if new != wl[t]: wl[t] = new; changed += 1
+    return changed or False
+
+def _remap_mask(mask, keys):
+    """저장 당시 비트 순서(keys) -> 현재 OPTION_KEYS. 새로 생긴 옵션은 기본값"""
+    out = sum(OPTION_BITS[k] for i, k in enumerate(keys) if k in OPTION_BITS and mask >> i & 1)
+    return out | sum(bit for k, bit in OPTION_BITS.items() if k not in keys and DEFAULT_OPTS[k])
+
+def migrate_config(data):
+    """저장된 설정을 현재 스키마로 -> (설정, 바뀌었는지). 이미 현재 스키마면 손대지 않음 (매 로드 재변환 없음)"""
+    keys = data.get('option_keys')
+    if data.get('schema') == CONFIG_SCHEMA and keys == list(OPTION_KEYS): return data, False
+    def convert(wl):
+        if data.get('schema') == CONFIG_SCHEMA: return {t: _remap_mask(int(v), keys or list(OPTION_KEYS)) for t, v in wl.items()}
+        return {t: options_to_mask(migrate_options(v)) for t, v in wl.items()}   # v1: 종목별 옵션 dict
+    # 저장본에 있는 목록만 변환 (없는 키는 호출자가 기본값으로 채움)
+    if 'tickers' in data: data['tickers'] = convert(data['tickers'])
+    if 'subscribers' in data:
+        data['subscribers'] = {str(chat): {'eco_mode': sub.get('eco_mode', True), 'tickers': convert(sub.get('tickers', {}))}
+                               for chat, sub in data['subscribers'].items()}
+    data['schema'] = CONFIG_SCHEMA; data['option_keys'] = list(OPTION_KEYS)
+    return data, True
+
+def fetch_cloud_config():
+    """JSONBin의 최신 레코드 (미설정이거나 실패하면 None)"""
+    url = get_jsonbin_url()
+    headers = get_jsonbin_headers()
+    if not (url and headers): return None
+    try:
+        resp = http.get(f"{url}/latest", headers=headers, timeout=5)
+        if resp.status_code == 200: return resp.json()['record']
+    except: pass
+    return None
+
+def fetch_config(loaded_data=None):
+    """저장소(JSONBin -> 로컬 백업)에서 설정을 읽어 마이그레이션 -> (설정, 스키마 이관 여부).
+
+    loaded_data를 주면(이미 받은 JSONBin 레코드) 다시 받지 않고 그것을 쓴다.
+    """
+    # 기본 구조
+    config = {
+        "schema": CONFIG_SCHEMA,
+        "option_keys": list(OPTION_KEYS),
+        "system_active": True,
+        "eco_mode": True,
+        "telegram": {"bot_token": "", "chat_id": ""}, 
+        "tickers": {"TSLA": DEFAULT_MASK, "NVDA": DEFAULT_MASK},
+        "subscribers": {},
+    }
+    
+    # 1. Cloud Load
+    if loaded_data is None: loaded_data = fetch_cloud_config()
+    
+    # 2. Local Backup Load
+    if not loaded_data and os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                loaded_data = json.load(f)
+        except: pass
+
+    # 저장본만 마이그레이션한 뒤 기본 구조에 병합 (news_history는 NewsDedupIndex로 1회 이관)
+    migrated = False
+    if loaded_data:
+        loaded = {k: loaded_data[k] for k in ("telegram", "system_active", "eco_mode", "news_history", "tickers", "subscribers")
+                  if k in loaded_data}
+        loaded['schema'] = loaded_data.get('schema', 1); loaded['option_keys'] = loaded_data.get('option_keys')
+        loaded, migrated = migrate_config(loaded)
+        config.update(loaded)
+        if migrated: write_log(f"설정 스키마 v{CONFIG_SCHEMA} 이관 ({len(config['tickers'])}종목)", stage="config")
+
+    return apply_secrets(config), migrated
+
+def apply_secrets(config):
+    """3. Secrets (최우선). 공유 저장소에서 읽은 설정에도 다시 적용"""
+    try:
+        if "telegram" in st.secrets:
+            config['telegram']['bot_token'] = st.secrets["telegram"]["bot_token"]
+            config['telegram']['chat_id'] = st.secrets["telegram"]["chat_id"]
+            if "allowed_chats" in st.secrets["telegram"]:
+                config['telegram']['allowed_chats'] = [str(c) for c in st.secrets["telegram"]["allowed_chats"]]
+    except: pass
+    return config
+
+def save_config(config):
+    """JSONBin과 로컬 백업에 실제 기록. ConfigStore.flush에서만 호출됨"""
+    ok = True
+    url = get_jsonbin_url()
+    headers = get_jsonbin_headers()
+    if url and headers:
+        try: ok = http.put(url, headers=headers, json=config, timeout=5).status_code == 200
+        except: ok = False
+    try:
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=4, ensure_ascii=False)
+    except: pass
+    return ok
+
+CONFIG_FLUSH_DELAY = 3.0  # 초. 이 시간 동안의 변경을 모아 한 번에 저장
+CONFIG_SYNC_INTERVAL = 2.0  # 초. 다른 프로세스가 바꾼 설정을 확인하는 최소 간격
+
+class ConfigStore:
+    """프로세스 전체가 공유하는 메모리 설정 저장소.
+
+    읽기는 메모리 사본으로 처리하고, 쓰기는 update()로 락 안에서 적용한 뒤
+    version을 올린다. 저장은 CONFIG_FLUSH_DELAY 뒤 한 번으로 병합된다.
+    워커와 UI가 다른 프로세스일 때는 state_store의 'config'가 살아 있는 원본이다.
+    쓰기는 거기에 바로 반영하고, 읽기는 CONFIG_SYNC_INTERVAL마다 rev를 확인해 따라간다.
+    저장(JSONBin/로컬 파일)에 성공하면 그 rev를 'config_saved'로 남겨, 다음 기동 때 공유 사본이
+    이미 저장된 것이면 JSONBin을 다시 읽어 맞춘다 (다른 배포가 고친 내용을 덮어쓰지 않도록).
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.flush_lock = threading.Lock()
+        self.data = None
+        self.version = 0
+        self.saved_version = 0
+        self.shared_rev = 0
+        self.synced = 0.0
+        self.timer = None
+
+    def _loaded(self):
+        if self.data is None:
+            with metrics.timer('stage', 'config.load'):
+                shared, rev = state_store.get('config')
+                saved, _ = state_store.get('config_saved')   # 없으면(이전 버전이 쓴 사본) 저장된 것으로 봄
+                unsaved = shared is not None and saved is not None and saved < rev
+                owned = worker_running()   # 다른 프로세스의 살아 있는 워커가 공유 사본을 쓰는 중
+                cloud = None
+                # 이미 저장된 공유 사본으로 새로 기동: 다른 배포가 고쳤을 수 있으므로 JSONBin 원본과 맞춤
+                if shared is not None and not unsaved and not owned:
+                    cloud = fetch_cloud_config()
+                    if cloud is not None: write_log("설정: JSONBin 원본으로 공유 사본 갱신", stage="config")
+                fetched = shared is None or cloud is not None
+                data, migrated = fetch_config(cloud) if fetched else migrate_config(shared)
+                self.data = apply_secrets(data)
+                self.shared_rev = state_store.put('config', self.data) if fetched or migrated else rev
+                if fetched and not migrated: state_store.put('config_saved', self.shared_rev)   # 저장소 내용 그대로
+            if migrated or (unsaved and not owned):   # 이관 결과/저장하지 못하고 끝난 변경은 다시 저장
+                self.version += 1; self._schedule()
+            self.synced = time.time()
+        elif time.time() - self.synced > CONFIG_SYNC_INTERVAL: self._sync()
+        return self.data
+
+    def _sync(self):
+        """다른 프로세스가 공유 저장소에 쓴 더 새 설정이 있으면 교체 (JSONBin 저장은 쓴 쪽이 함)"""
+        self.synced = time.time()
+        try:
+            if state_store.rev('config') == self.shared_rev: return
+            shared, rev = state_store.get('config')
+        except Exception as e:
+            write_log(f"Config Sync Err: {e}", "ERROR", stage="config"); return
+        if shared is None: return
+        clean = not self.dirty
+        self.data = apply_secrets(migrate_config(shared)[0]); self.shared_rev = rev; self.version += 1
+        if clean: self.saved_version = self.version
+
+    @property
+    def dirty(self):
+        return self.version != self.saved_version
+
+    def snapshot(self):
+        """호출자가 자유롭게 수정해도 되는 깊은 복사본"""
+        with self.lock: return copy.deepcopy(self._loaded())
+
+    def get(self, key, default=None):
+        with self.lock: return copy.deepcopy(self._loaded().get(key, default))
+
+    def update(self, fn):
+        """fn(config)를 락 안에서 실행. fn이 False를 반환하면 변경 없음으로 간주"""
+        with self.lock:
+            self._loaded()
+            with state_store.transaction():
+                self._sync()   # 다른 프로세스의 최신 설정 위에 적용
+                result = fn(self.data)
+                if result is not False:
+                    self.version += 1
+                    self.shared_rev = state_store.put('config', self.data)
+                    self._schedule()
+            return result
+
+    def _schedule(self):
+        if self.timer is None:
+            self.timer = threading.Timer(CONFIG_FLUSH_DELAY, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """대기 중인 변경을 한 번에 기록. 기록 중 생긴 변경은 다음 flush로 넘김"""
+        with self.flush_lock:
+            with self.lock:
+                self.timer = None
+                if not self.dirty: return
+                payload = copy.deepcopy(self.data); version = self.version; rev = self.shared_rev
+            with metrics.timer('stage', 'config.save'): ok = save_config(payload)
+            if ok:
+                with self.lock: self.saved_version = max(self.saved_version, version)
+                try:
+                    with state_store.transaction():
+                        if (state_store.get('config_saved')[0] or 0) < rev: state_store.put('config_saved', rev)
+                except Exception as e: write_log(f"Config Saved Mark Err: {e}", "ERROR", stage="config")
+            else:
+                write_log("Config 저장 실패, 재시도 예약", "WARN", stage="config")
+                with self.lock: self._schedule()
+
+config_store = ConfigStore()
+atexit.register(config_store.flush)
+
+def load_config():
+    """메모리 설정의 사본 (네트워크 호출 없음)"""
+    return config_store.snapshot()
+
+# ---------------------------------------------------------
+# [1-2] 구독자 (채팅방별 감시 목록 + 종목/규칙 -> 채팅방 역색인)
+# ---------------------------------------------------------
+WATCH_KEY = "🟢 감시"
+NEWS_RULES = {'news': "📰 뉴스", 'sec': "🏛️ SEC"}   # 뉴스 규칙 -> 옵션 키
+
+def primary_chat(cfg):
+    return str(cfg['telegram'].get('chat_id') or "")
+
+def subscriptions(cfg):
+    """{chat_id: {'tickers', 'eco_mode'}}. 기본 채팅방(telegram.chat_id)은 최상위 tickers/eco_mode를 쓴다"""
+    subs = {}
+    primary = primary_chat(cfg)
+    if primary: subs[primary] = {'tickers': cfg.get('tickers', {}), 'eco_mode': cfg.get('eco_mode', True)}
+    for chat_id, sub in cfg.get('subscribers', {}).items():
+        if chat_id != primary: subs[chat_id] = {'tickers': sub.get('tickers', {}), 'eco_mode': sub.get('eco_mode', True)}
+    return subs
+
+def chat_allowed(cfg, chat_id):
+    """기본 채팅방과 telegram.allowed_chats 목록만 구독/종목 추가/on·off 가능 (목록이 없으면 기본 채팅방만)"""
+    chat_id = str(chat_id)
+    return chat_id == primary_chat(cfg) or chat_id in (cfg['telegram'].get('allowed_chats') or ())
+
+def chat_watchlist(c, chat_id, create=False):
+    """설정 c 안의 해당 채팅방 감시 목록 dict (수정하면 그대로 반영). 구독 전이면 None 또는 새로 만듦"""
+    chat_id = str(chat_id)
+    if chat_id == primary_chat(c): return c['tickers']
+    sub = c.get('subscribers', {}).get(chat_id)
+    if sub is None and create:
+        sub = c.setdefault('subscribers', {})[chat_id] = {'eco_mode': True, 'tickers': {}}
+    return sub['tickers'] if sub is not None else None
+
+class SubscriberIndex:
+    """설정에서 만든 역색인: (티커, 규칙) -> 채팅방들, 티커 -> 구독자 옵션 마스크의 OR.
+
+    감시 종목은 구독 채팅방 수와 관계없이 한 사이클에 한 번만 받아 평가하고,
+    발화한 (티커, 규칙)만 이 색인으로 해당 채팅방들에 나눠 보낸다.
+    """
+    def __init__(self, cfg):
+        self.by_rule = {}      # (ticker, rule) -> set(chat_id)
+        self.options = {}      # ticker -> 옵션 마스크 (감시 중인 구독자들의 OR)
+        self.eco_chats = []
+        watch = OPTION_BITS[WATCH_KEY]
+        rules = [(r, OPTION_BITS[k]) for r, k in list(RULE_OPTIONS.items()) + list(NEWS_RULES.items())]
+        for chat_id, sub in subscriptions(cfg).items():
+            if sub['eco_mode']: self.eco_chats.append(chat_id)
+            for t, mask in sub['tickers'].items():
+                if not mask & watch: continue
+                self.options[t] = self.options.get(t, 0) | mask
+                for rule, bit in rules:
+                    if mask & bit: self.by_rule.setdefault((t, rule), set()).add(chat_id)
+
+    def chats(self, ticker, rule):
+        return self.by_rule.get((ticker, rule), ())
+
+    def tickers(self, *rules):
+        """감시 중인 종목 (rules를 주면 그 규칙을 켠 구독자가 있는 종목만)"""
+        if not rules: return list(self.options)
+        bits = option_bits(*(NEWS_RULES.get(r) or RULE_OPTIONS[r] for r in rules))
+        return [t for t, mask in self.options.items() if mask & bits]
+
+_subscriber_index = (None, None)   # ((store id, config version), SubscriberIndex)
+
+def subscriber_index():
+    """현재 설정의 SubscriberIndex. 설정 버전이 바뀔 때만 다시 만듦"""
+    global _subscriber_index
+    with config_store.lock:
+        key = (id(config_store), config_store.version)
+        if _subscriber_index[0] != key:
+            _subscriber_index = (key, SubscriberIndex(config_store._loaded()))
+        return _subscriber_index[1]
+
+# ---------------------------------------------------------
+# [1-1] 번역 캐시 (LRU + 디스크 보존 + 일괄 번역)
+# ---------------------------------------------------------
+TRANSLATION_CACHE_SIZE = 5000   # 보관할 최대 원문 수
+TRANSLATION_BATCH_CHARS = 4500  # GoogleTranslator 요청당 5000자 제한 여유분
+TRANSLATION_SAVE_DELAY = 10.0   # 초. 새 번역을 모아 한 번에 디스크 기록
+
+class TranslationCache:
+    """원문 -> 한국어 번역 LRU 캐시. 재시작 후에도 유지되도록 TRANSLATION_FILE에 저장"""
+    def __init__(self, path=TRANSLATION_FILE, maxsize=TRANSLATION_CACHE_SIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+        self.translator = None   # 첫 번역 때 생성 (deep_translator 지연 import)
+        self.timer = None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for k, v in json.load(f).items(): self.items[k] = v
+        except: pass
+
+    def get(self, text):
+        with self.lock:
+            if text not in self.items: return None
+            self.items.move_to_end(text)
+            return self.items[text]
+
+    def put_many(self, pairs):
+        with self.lock:
+            for src, dst in pairs:
+                self.items[src] = dst
+                self.items.move_to_end(src)
+            while len(self.items) > self.maxsize: self.items.popitem(last=False)
+            if self.timer is None:
+                self.timer = threading.Timer(TRANSLATION_SAVE_DELAY, self.save)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def save(self):
+        with self.lock:
+            self.timer = None
+            data = dict(self.items)
+        try:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f: json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except: pass
+
+    def _translate_chunk(self, texts):
+        """줄바꿈으로 이어 붙여 한 번의 요청으로 번역. 줄 수가 어긋나면 개별 번역으로 대체"""
+        if self.translator is None: self.translator = deep_translator.GoogleTranslator(source='auto', target='ko')
+        def call(text):
+            with metrics.timer('http', 'translate.google.com'): return self.translator.translate(text)
+        try:
+            out = call("\n".join(texts)).split("\n")
+            if len(out) == len(texts): return [o.strip() or t for o, t in zip(out, texts)]
+        except: pass
+        res = []
+        for t in texts:
+            try: res.append(call(t) or t)
+            except: res.append(None)  # 실패는 캐시하지 않음
+        return res
+
+    def translate_many(self, texts):
+        """여러 원문을 번역. 캐시에 없는 것만 모아 일괄 요청"""
+        texts = [" ".join((t or "").split()) for t in texts]
+        result = {t: self.get(t) for t in set(texts) if t}
+        pending = [t for t, v in result.items() if v is None]
+        chunk, size, fresh = [], 0, []
+        for t in pending + [None]:
+            if chunk and (t is None or size + len(t) + 1 > TRANSLATION_BATCH_CHARS):
+                fresh += [(s, d) for s, d in zip(chunk, self._translate_chunk(chunk)) if d]
+                chunk, size = [], 0
+            if t is not None: chunk.append(t); size += len(t) + 1
+        if fresh:
+            self.put_many(fresh)
+            result.update(fresh)
+        return [result.get(t) or t for t in texts]
+
+    def translate(self, text):
+        return self.translate_many([text])[0]
+
+translations = TranslationCache()
+atexit.register(translations.save)
+
+# ---------------------------------------------------------
+# [2] 데이터 엔진
+# ---------------------------------------------------------
+def parse_rss_items(content):
+    """RSS 본문 -> (제목, 링크, 발행일) 목록. 304 응답이면 호출되지 않음"""
+    items = []
+    for item in ET.fromstring(content).findall('.//item'):
+        try: items.append((item.find('title').text, item.find('link').text, item.find('pubDate').text))
+        except: continue
+    return items
+
+NEWS_MAX_AGE = timedelta(hours=24)
+
+def parse_pubdate(pubDate):
+    """RSS pubDate('Tue, 06 May 2025 13:05:00 GMT') -> UTC naive datetime. 형식이 다르면 None"""
+    try: return datetime.strptime(pubDate.replace(' GMT', ''), '%a, %d %b %Y %H:%M:%S')
+    except: return None
+
+def fetch_news(ticker, is_sec_search=False):
+    """RSS 검색 결과 중 NEWS_MAX_AGE 안의 항목 (번역 전, 제목은 'raw_title')"""
+    if is_sec_search:
+        search_urls = [f"https://news.google.com/rss/search?q={ticker}+SEC+Filing+OR+8-K+OR+10-Q+OR+10-K+when:2d&hl=en-US&gl=US&ceid=US:en"]
+    else:
+        search_urls = [f"https://news.google.com/rss/search?q={ticker}+stock+news+when:1d&hl=en-US&gl=US&ceid=US:en"]
+
+    collected_items = []
+    seen_links = set()
+
+    def fetch(url):
+        try:
+            # 호스트가 차단됐거나 실패하면 마지막으로 받은 목록 (신선도 필터와 중복 인덱스를 그대로 거침)
+            for raw_title, link, pubDate in http.get_cached(url, parse_rss_items, fallback=True, timeout=3)[:3]:
+                try:
+                    title = raw_title.split(' - ')[0]
+                    if link in seen_links: continue
+                    seen_links.add(link)
+                    
+                    dt_obj = parse_pubdate(pubDate)
+                    if dt_obj and (datetime.utcnow() - dt_obj) > NEWS_MAX_AGE: continue
+                    date_str = dt_obj.strftime('%m/%d %H:%M') if dt_obj else "Recent"
+                    
+                    collected_items.append({'raw_title': title, 'link': link, 'date': date_str})
+                except: continue
+        except: pass
+    for url in search_urls: fetch(url)
+    return collected_items
+
+def translate_titles(items, prefix):
+    """항목들의 제목을 translate_many 한 번으로 번역해 'title'을 채움 (캐시 적중분은 요청 없음)"""
+    titles_ko = translations.translate_many([i['raw_title'][:150] for i in items])
+    for item, title_ko in zip(items, titles_ko): item['title'] = f"{prefix} {title_ko}"
+    return items
+
+def get_integrated_news(ticker, is_sec_search=False):
+    return translate_titles(fetch_news(ticker, is_sec_search), "🏛️" if is_sec_search else "📰")
+
+ECO_FEED_URL = "https://nfs.faireconomy.media/ff_calendar_thisweek.xml"
+ECO_FEED_TZ = ZoneInfo("UTC")   # 피드의 date/time 기준 시간대
+ECO_TTL = 3600                  # 초. 이 주기로 재검증(304면 파싱/번역 생략)
+
+def parse_eco_time(date_text, time_text):
+    """'10-17-2026' + '8:30am' -> UTC datetime. 'All Day'/'Tentative' 등 시각 없는 일정은 None"""
+    try:
+        dt = datetime.strptime(f"{date_text} {time_text.strip().lower()}", "%m-%d-%Y %I:%M%p")
+        return dt.replace(tzinfo=ECO_FEED_TZ).astimezone(timezone.utc)
+    except: return None
+
+def parse_eco_day(date_text):
+    try: return datetime.strptime(date_text, "%m-%d-%Y").strftime('%Y-%m-%d')
+    except: return date_text
+
+def parse_eco_calendar(content):
+    """ForexFactory 주간 XML -> USD High/Medium 이벤트 목록 (번역 전)"""
+    root = ET.fromstring(content)
+    events = []
+    for event in root.findall('event'):
+        if event.find('country').text != 'USD': continue
+        if event.find('impact').text not in ['High', 'Medium']: continue
+        title = event.find('title').text
+        date_text = event.find('date').text; time_text = event.find('time').text or ""
+        release_at = parse_eco_time(date_text, time_text)
+        actual = event.find('actual'); url = event.find('url')
+        events.append({
+            'date': date_text,
+            'time': time_text,
+            'event': title,
+            'raw_event': title,
+            'impact': event.find('impact').text,
+            'forecast': event.find('forecast').text or "",
+            'previous': event.find('previous').text or "",
+            'actual': (actual.text or "") if actual is not None else None,   # None: 피드에 실제값 필드 자체가 없음
+            'url': (url.text or "") if url is not None else "",
+            'release_at': release_at,
+            'day': release_at.astimezone().strftime('%Y-%m-%d') if release_at else parse_eco_day(date_text),
+            'id': f"{date_text}_{time_text}_{title}"
+        })
+    return events
+
+class EconomicCalendar:
+    """이번 주 경제 일정 캐시. ECO_TTL마다 조건부 GET으로 재검증하고 번역본을 보관"""
+    def __init__(self, ttl=ECO_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.cached = []
+        self.fetched = 0.0
+
+    def refresh(self):
+        raw = http.get_cached(ECO_FEED_URL, parse_eco_calendar, timeout=10)
+        events = [dict(e) for e in raw]
+        for e, title_ko in zip(events, translations.translate_many([e['raw_event'] for e in events])): e['event'] = title_ko
+        far = datetime.max.replace(tzinfo=timezone.utc)
+        events.sort(key=lambda x: (x['day'], x['release_at'] or far))
+        with self.lock: self.cached = events; self.fetched = time.time()
+        return events
+
+    def events(self, max_age=None):
+        max_age = self.ttl if max_age is None else max_age
+        with self.lock:
+            if self.cached and time.time() - self.fetched < max_age: return list(self.cached)
+        try: return list(self.refresh())
+        except Exception as e:
+            write_log(f"Eco Err: {e}", "ERROR", stage="eco")
+            with self.lock: return list(self.cached)
+
+eco_calendar = EconomicCalendar()
+
+def get_economic_events():
+    return eco_calendar.events()
+
+# ---------------------------------------------------------
+# [2-1] 뉴스 중복 제거 인덱스
+# ---------------------------------------------------------
+NEWS_SEEN_TTL = 3 * 86400      # 초. RSS 검색 구간(최대 2일)보다 길게
+NEWS_SEEN_FLUSH_DELAY = 15.0   # 초. 새 항목을 모아 한 번에 디스크 기록
+NEWS_STOPWORDS = {'the', 'a', 'an', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'at', 'by', 'with', 'as', 'is', 'are',
+                  'its', 'from', 'after', 'amid', 'stock', 'stocks', 'shares', 'says', 'report', 'reports'}
+
+def normalize_link(link):
+    """쿼리/프래그먼트 제거 + 호스트 소문자"""
+    parts = urlsplit((link or "").strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), '', ''))
+
+def headline_signature(title):
+    """언론사 꼬리표·문장부호·불용어를 뺀 단어 집합. 다른 URL로 재배포된 같은 기사 판별용"""
+    words = re.findall(r"[a-z0-9$%.]+", (title or "").split(' - ')[0].lower())
+    return " ".join(sorted({w.strip('.') for w in words if len(w) > 1 and w not in NEWS_STOPWORDS}))
+
+class NewsDedupIndex:
+    """보낸 뉴스의 (종목, 링크)/(종목, 제목 서명) 해시 -> 만료 시각.
+
+    조회는 dict O(1), 기록은 NEWS_SEEN_FLUSH_DELAY 단위로 모아 NEWS_SEEN_FILE에 저장한다.
+    설정(JSONBin)과 분리되어 알림 경로에서 설정 쓰기가 일어나지 않는다.
+    """
+    def __init__(self, path=NEWS_SEEN_FILE, ttl=NEWS_SEEN_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.clock = time.time   # 리플레이에서 모의 시계로 교체
+        self.lock = threading.Lock()
+        self.timer = None
+        self.seen = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f: self.seen = json.load(f)
+        except: pass
+
+    def _keys(self, ticker, link, title):
+        keys = [f"l|{ticker}|{normalize_link(link)}"]
+        sig = headline_signature(title)
+        if sig: keys.append(f"t|{ticker}|{sig}")
+        return [hashlib.sha1(k.encode('utf-8')).hexdigest()[:16] for k in keys]
+
+    def claim(self, ticker, link, title):
+        """처음 보는 기사면 기록하고 True, 이미 보낸 기사(또는 유사 제목)면 False"""
+        keys = self._keys(ticker, link, title)
+        now = self.clock()
+        with self.lock:
+            if any(self.seen.get(k, 0) > now for k in keys): return False
+            for k in keys: self.seen[k] = now + self.ttl
+            self._schedule()
+        return True
+
+    def import_history(self, history):
+        """구버전 config['news_history'] ({티커: [링크]}) 이관"""
+        expire = self.clock() + self.ttl
+        with self.lock:
+            for ticker, links in history.items():
+                for link in links: self.seen.setdefault(self._keys(ticker, link, "")[0], expire)
+            self._schedule()
+
+    def _schedule(self):
+        if self.timer is None:
+            self.timer = threading.Timer(NEWS_SEEN_FLUSH_DELAY, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        now = self.clock()
+        with self.lock:
+            self.timer = None
+            self.seen = {k: exp for k, exp in self.seen.items() if exp > now}
+            data = dict(self.seen)
+        try:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f: json.dump(data, f)
+            os.replace(tmp, self.path)
+        except: pass
+
+news_index = NewsDedupIndex()
+atexit.register(news_index.flush)
+
+def migrate_news_history():
+    """구버전 config['news_history']를 news_index로 1회 이관"""
+    legacy = config_store.get('news_history')
+    if legacy:
+        news_index.import_history(legacy)
+        config_store.update(lambda c: c.pop('news_history', None))
+
+# ---------------------------------------------------------
+# [2-2] Finviz 스냅샷 (세션 재사용 + XPath 파싱 + TTL 캐시)
+# ---------------------------------------------------------
+FINVIZ_TTL = 3 * 3600          # 초. 재무/실적일은 하루에 몇 번만 바뀜
+FINVIZ_FAIL_TTL = 600          # 초. 실패한 종목은 잠시 재시도하지 않음
+FINVIZ_SNAPSHOT_XPATH = "//table[contains(@class, 'snapshot-table2')]//td"
+
+def _to_float(v):
+    try: return float(str(v).replace(',', '').replace('%', ''))
+    except: return None
+
+@dataclass
+class FinvizSnapshot:
+    """Finviz 종목 스냅샷 표 중 사용하는 값. raw에는 표 전체(라벨 -> 값)"""
+    ticker: str
+    price: float = None
+    pe: float = None
+    pb: float = None
+    target_price: float = None
+    market_cap: str = None
+    earnings: str = None
+    fetched: float = 0.0
+    raw: dict = field(default_factory=dict)
+    source: str = 'finviz'      # Finviz 차단 중 대체값이면 'yahoo'
+
+def parse_finviz_snapshot(ticker, text):
+    """스냅샷 표(라벨/값이 번갈아 나오는 td)만 XPath로 읽음"""
+    cells = [td.text_content().strip() for td in lxml_html.fromstring(text).xpath(FINVIZ_SNAPSHOT_XPATH)]
+    raw = dict(zip(cells[0::2], cells[1::2]))
+    text_or_none = lambda k: raw.get(k) if raw.get(k) not in (None, '', '-') else None
+    return FinvizSnapshot(
+        ticker=ticker, price=_to_float(raw.get('Price')), pe=_to_float(raw.get('P/E')), pb=_to_float(raw.get('P/B')),
+        target_price=_to_float(raw.get('Target Price')), market_cap=text_or_none('Market Cap'),
+        earnings=text_or_none('Earnings'), fetched=time.time(), raw=raw)
+
+class FinvizClient:
+    """종목별 FinvizSnapshot TTL 캐시. 요청은 HttpClient의 finviz.com 스크레이퍼 세션을 재사용"""
+    def __init__(self, ttl=FINVIZ_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.cache = {}      # ticker -> FinvizSnapshot
+        self.failed = {}     # ticker -> 실패 시각
+
+    def fetch(self, ticker):
+        url = f"https://finviz.com/quote.ashx?t={ticker}"
+        try: text = http.get(url, timeout=5).text
+        except CircuitOpenError: raise
+        except Exception: text = http.get(url, scraper=False, headers=DEFAULT_HEADERS, timeout=5).text
+        snap = parse_finviz_snapshot(ticker, text)
+        if not snap.raw: raise ValueError("snapshot table not found")
+        return snap
+
+    def get(self, ticker, max_age=None, fallback=True):
+        """캐시가 max_age(기본 TTL)보다 오래됐을 때만 새로 받음. 실패 시 이전 값, 그것도 없으면 (fallback이면) Yahoo 대체값"""
+        ticker = ticker.upper(); max_age = self.ttl if max_age is None else max_age
+        now = time.time()
+        with self.lock:
+            snap = self.cache.get(ticker)
+            if snap and now - snap.fetched < max_age: return snap
+            retry = now - self.failed.get(ticker, 0) >= FINVIZ_FAIL_TTL
+        if retry:
+            try:
+                snap = self.fetch(ticker)
+                with self.lock: self.cache[ticker] = snap; self.failed.pop(ticker, None)
+            except Exception as e:
+                # 차단 중 거절은 차단 시점에 한 번만 기록됨
+                if not isinstance(e, CircuitOpenError): write_log(f"Finviz Err: {e}", "ERROR", ticker=ticker, stage="finviz")
+                with self.lock: self.failed[ticker] = now
+        if snap is None and fallback:
+            try: snap = yahoo_snapshot(ticker)
+            except Exception as e: write_log(f"Yahoo Fallback Err: {e}", "ERROR", ticker=ticker, stage="finviz")
+        return snap
+
+    def stale(self, tickers):
+        now = time.time()
+        with self.lock:
+            return [t for t in tickers if now - getattr(self.cache.get(t), 'fetched', 0) >= self.ttl]
+
+finviz = FinvizClient()
+
+def yahoo_snapshot(ticker):
+    """Finviz를 못 쓸 때의 대체 스냅샷. 현재가는 시세 스냅샷, 시가총액은 yfinance (PER/PBR/목표가/실적일 없음)"""
+    q = market.quote(ticker)
+    cap = http.guarded(YAHOO_HOST, lambda: yf.Ticker(ticker).fast_info.market_cap)
+    return FinvizSnapshot(ticker=ticker, price=q['last'] if q else None, market_cap=f"{cap / 1e9:.2f}B" if cap else None,
+                          fetched=time.time(), source='yahoo')
+
+def get_finviz_data(ticker):
+    return finviz.get(ticker)
+
+# ---------------------------------------------------------
+# [2-3] 시세 스냅샷 (로컬 OHLCV 캐시 + 증분 일괄 다운로드)
+# ---------------------------------------------------------
+OHLCV_RETENTION_DAYS = 400   # 로컬 캐시에 보관할 일봉 기간
+OHLCV_FIELDS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+SNAPSHOT_PERIOD = "1y"    # 캐시가 없는 종목의 최초 다운로드 구간
+SNAPSHOT_BARS = 260       # 메모리에 올려 두는 일봉 수 (52주 신고가·MA60 계산용)
+SNAPSHOT_MAX_AGE = 60     # 초. 이보다 오래된 스냅샷은 재다운로드
+SPOT_PERIOD = "5d"        # 감시하지 않는 종목 단건 시세(/p)용 다운로드 구간
+
+class OhlcvStore:
+    """종목별 일봉을 SQLite에 보관. 마지막 저장일 이후의 봉만 덧붙이고 보관 기간을 넘긴 봉은 정리"""
+    def __init__(self, path=OHLCV_DB_FILE, retention_days=OHLCV_RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self.lock = threading.Lock()
+        self.pruned = 0.0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")   # 워커가 쓰는 동안 UI 프로세스도 읽음
+        with self.lock, self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS bars (
+                ticker TEXT, date TEXT, open REAL, high REAL, low REAL, close REAL, adj_close REAL, volume REAL,
+                PRIMARY KEY (ticker, date)) WITHOUT ROWID""")
+
+    def upsert(self, ohlcv):
+        """(필드, 티커) 프레임을 저장. 같은 날짜 봉은 덮어씀 (장중 미완성 봉 갱신)"""
+        if ohlcv.empty: return
+        # (일자, 티커) 행으로 한 번에 펼침 (종목별 xs 반복 없이)
+        long = ohlcv.stack(level=1, future_stack=True).reindex(columns=OHLCV_FIELDS).dropna(subset=['Close'])
+        dates = long.index.get_level_values(0).strftime('%Y-%m-%d')
+        vals = long.to_numpy(dtype=float).astype(object)
+        vals[pd.isna(vals)] = None
+        rows = [(t, d, *v) for t, d, v in zip(long.index.get_level_values(1), dates, vals.tolist())]
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO bars VALUES (?,?,?,?,?,?,?,?)", rows)
+        self.prune()
+
+    def load(self, tickers, bars=SNAPSHOT_BARS):
+        """종목들의 최근 bars개 일봉을 (필드, 티커) 프레임으로 읽음"""
+        tickers = list(tickers)
+        if not tickers: return pd.DataFrame()
+        since = (datetime.now() - timedelta(days=int(bars * 7 / 5) + 10)).strftime('%Y-%m-%d')
+        marks = ",".join("?" * len(tickers))
+        with self.lock:
+            df = pd.read_sql_query(f"SELECT * FROM bars WHERE ticker IN ({marks}) AND date >= ?", self.conn, params=tickers + [since])
+        if df.empty: return pd.DataFrame()
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.rename(columns=dict(zip(['open', 'high', 'low', 'close', 'adj_close', 'volume'], OHLCV_FIELDS)))
+        return df.pivot(index='date', columns='ticker', values=OHLCV_FIELDS).tail(bars)
+
+    def tickers(self):
+        with self.lock: return [r[0] for r in self.conn.execute("SELECT DISTINCT ticker FROM bars ORDER BY ticker")]
+
+    def drop(self, tickers):
+        tickers = list(tickers)
+        if not tickers: return
+        with self.lock, self.conn:
+            self.conn.execute(f"DELETE FROM bars WHERE ticker IN ({','.join('?' * len(tickers))})", tickers)
+
+    def prune(self, every=3600):
+        if time.time() - self.pruned < every: return
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+        with self.lock, self.conn: self.conn.execute("DELETE FROM bars WHERE date < ?", (cutoff,))
+        self.pruned = time.time()
+
+class MarketSnapshot:
+    """감시 종목 전체의 최근 일봉을 공유하는 OHLCV 프레임.
+
+    컬럼은 (필드, 티커) MultiIndex, 인덱스는 일자. 알림 규칙, 봇 명령어(/p, /summary),
+    대시보드 카드가 모두 이 프레임을 읽는다. 과거 봉은 OhlcvStore에서 처음 필요할 때 읽어 오고,
+    이후 갱신은 종목별 마지막 봉 이후만 멀티 심볼 요청으로 받는다.
+    """
+    def __init__(self, store=None):
+        self.lock = threading.Lock()
+        self.store = store or OhlcvStore()
+        self._ohlcv = None        # 처음 읽을 때 빈 프레임 (pandas를 import 시점에 부르지 않음)
+        self.updated = 0.0
+        self.fetched = {}         # ticker -> 마지막으로 받은 시각
+        self.version = 0          # 프레임이 바뀔 때마다 증가 (UI 캐시 키)
+        self.refreshing = threading.Lock()
+        self._quotes = (None, None)
+
+    @property
+    def ohlcv(self):
+        if self._ohlcv is None: self._ohlcv = pd.DataFrame()
+        return self._ohlcv
+
+    @ohlcv.setter
+    def ohlcv(self, value): self._ohlcv = value
+
+    @staticmethod
+    def _missing(data, tickers, known):
+        """yf.download 응답에서 빠진 종목 -> 차단기 실패 사유 (없으면 None).
+
+        이미 봉이 있던 종목(known, 증분 요청)이 빠졌거나 여러 종목이 통째로 비면 실패로 본다.
+        처음 받는 종목 하나가 비는 건 잘못된 티커일 수 있어 세지 않음 (매 회차 차단기를 열지 않도록).
+        """
+        got = set()
+        if data is not None and not data.empty and "Close" in data.columns.get_level_values(0):
+            close = data["Close"]
+            got = set(close.columns[close.notna().any()]) if isinstance(data.columns, pd.MultiIndex) else set(tickers)
+        missing = [t for t in tickers if t not in got]
+        if missing and (known or (len(tickers) > 1 and len(missing) == len(tickers))):
+            return f"yfinance: no data for {len(missing)}/{len(tickers)} ({', '.join(missing[:5])})"
+        return None
+
+    def _download(self, tickers, **kw):
+        known = 'start' in kw   # 증분 요청 = 이미 봉이 있는 종목
+        with metrics.timer('http', YAHOO_HOST):
+            data = http.guarded(YAHOO_HOST, yf.download, tickers, interval="1d", group_by="column", auto_adjust=False,
+                                actions=False, progress=False, threads=True, multi_level_index=True,
+                                check=lambda data: self._missing(data, tickers, known), **kw)
+        if data is None or data.empty: return pd.DataFrame()
+        if not isinstance(data.columns, pd.MultiIndex):
+            data.columns = pd.MultiIndex.from_product([data.columns, tickers])
+        return data.dropna(how='all')
+
+    def _merge(self, data):
+        if data.empty: return
+        data.columns.names = ['Price', 'Ticker']
+        with self.lock:
+            old = self.ohlcv
+            if old.empty: merged = data
+            elif data.columns.isin(old.columns).all(): merged = self._overlay(old, data)
+            else: merged = data.combine_first(old)
+            self.ohlcv = merged.sort_index().tail(SNAPSHOT_BARS)
+            self.version += 1
+
+    @staticmethod
+    def _overlay(old, data):
+        """증분 갱신용 combine_first. 열마다 정렬하지 않고 새 값이 있는 칸만 배열에서 한 번에 덮어씀"""
+        index = old.index.union(data.index)
+        arr = old.reindex(index).to_numpy(dtype=float, copy=True)
+        rows = index.get_indexer(data.index)[:, None]; cols = old.columns.get_indexer(data.columns)
+        new = data.to_numpy(dtype=float)
+        arr[rows, cols] = np.where(np.isnan(new), arr[rows, cols], new)
+        return pd.DataFrame(arr, index=index, columns=old.columns)
+
+    def refresh(self, tickers):
+        """종목별 마지막 봉 이후만 받아 캐시/스냅샷 갱신. 시작일이 같은 종목끼리 한 번에 요청"""
+        tickers = sorted({t.upper() for t in tickers if t})
+        if not tickers: return self.ohlcv
+        with self.lock: have = set(self.ohlcv.columns.get_level_values(1)) if not self.ohlcv.empty else set()
+        cold = [t for t in tickers if t not in have]
+        if cold:
+            try: self._merge(self.store.load(cold))
+            except Exception as e: write_log(f"OHLCV Cache Err: {e}", "ERROR", stage="prices.snapshot")
+
+        # 마지막 저장 봉 날짜별로 묶기 (그날 봉도 다시 받아 장중 값 갱신)
+        close = self.frame("Close")
+        groups = {}
+        for t in tickers:
+            last = close[t].last_valid_index() if t in close.columns else None
+            groups.setdefault(last.strftime('%Y-%m-%d') if last is not None else None, []).append(t)
+        for start, group in groups.items():
+            try:
+                data = self._download(group, start=start) if start else self._download(group, period=SNAPSHOT_PERIOD)
+            except CircuitOpenError: break   # 차단 중: 기존 스냅샷/OHLCV 캐시를 그대로 씀
+            except Exception as e:
+                write_log(f"Snapshot Err: {e}", "ERROR", stage="prices.snapshot")
+                continue
+            now = time.time()
+            with self.lock: self.fetched.update((t, now) for t in group)
+            if data.empty: continue
+            self._merge(data)
+            try: self.store.upsert(data)
+            except Exception as e: write_log(f"OHLCV Cache Err: {e}", "ERROR", stage="prices.snapshot")
+        with self.lock: self.updated = time.time()
+        return self.ohlcv
+
+    def ensure(self, tickers, max_age=SNAPSHOT_MAX_AGE):
+        """요청한 종목 중 max_age보다 오래됐거나 없는 것만 다시 받는다"""
+        stale = self.stale(tickers, max_age)
+        if stale: self.refresh(stale)
+
+    def stale(self, tickers, max_age=SNAPSHOT_MAX_AGE):
+        now = time.time()
+        with self.lock: return [t for t in {t.upper() for t in tickers if t} if now - self.fetched.get(t, 0) > max_age]
+
+    def retain(self, tickers):
+        """감시 목록에서 빠진 종목(/del 등)을 스냅샷과 OHLCV 캐시에서 제거"""
+        keep = {t.upper() for t in tickers if t}
+        with self.lock:
+            if self.ohlcv.empty: return
+            gone = sorted(set(self.ohlcv.columns.get_level_values(1)) - keep)
+            if not gone: return
+            self.ohlcv = self.ohlcv.drop(columns=gone, level=1)
+            for t in gone: self.fetched.pop(t, None)
+            self.version += 1
+        try: self.store.drop(gone)
+        except Exception as e: write_log(f"OHLCV Cache Err: {e}", "ERROR", stage="prices.snapshot")
+
+    def spot(self, ticker):
+        """감시하지 않는 종목의 일회성 시세. 최근 몇 봉만 받고 스냅샷/OHLCV 캐시에는 넣지 않음"""
+        try: data = self._download([ticker.upper()], period=SPOT_PERIOD)
+        except CircuitOpenError: return None
+        if data.empty or "Close" not in data.columns.get_level_values(0): return None
+        close = data["Close"].iloc[:, 0].dropna()
+        if len(close) < 2: return None
+        last, prev = float(close.iloc[-1]), float(close.iloc[-2])
+        return {'last': last, 'prev_close': prev, 'pct': (last - prev) / prev * 100}
+
+    def ensure_background(self, tickers, max_age=SNAPSHOT_MAX_AGE):
+        """ensure를 별도 스레드에서 실행 (이미 진행 중이면 생략). 화면 렌더링을 막지 않음"""
+        if not self.refreshing.acquire(blocking=False): return
+        def run():
+            try: self.ensure(tickers, max_age)
+            finally: self.refreshing.release()
+        threading.Thread(target=run, daemon=True, name="DeBrief_SnapshotRefresh").start()
+
+    def follow(self, tickers, updated):
+        """별도 프로세스 워커가 OhlcvStore에 쓴 봉을 다시 읽음. 워커의 스냅샷 시각이 바뀐 때만, 외부 호출 없음"""
+        if not updated or updated <= self.updated: return
+        try: self._merge(self.store.load({t.upper() for t in tickers if t}))
+        except Exception as e:
+            write_log(f"OHLCV Cache Err: {e}", "ERROR", stage="prices.snapshot"); return
+        with self.lock: self.updated = updated
+
+    def age(self):
+        return time.time() - self.updated if self.updated else None
+
+    def frame(self, field="Close"):
+        """필드 하나를 (일자 x 티커) 프레임으로 반환"""
+        with self.lock: data = self.ohlcv
+        if data.empty or field not in data.columns.get_level_values(0): return pd.DataFrame()
+        return data[field]
+
+    def quotes(self):
+        """전 종목 현재가/전일종가/등락률을 벡터 연산으로 계산 (프레임 버전별로 재사용)"""
+        version, cached = self._quotes
+        if version == self.version and cached is not None: return cached
+        version = self.version
+        close = self.frame("Close").ffill()
+        if len(close) < 2: return pd.DataFrame(columns=['last', 'prev_close', 'pct'])
+        last = close.iloc[-1]; prev = close.iloc[-2]
+        out = pd.DataFrame({'last': last, 'prev_close': prev, 'pct': (last - prev) / prev * 100})
+        out = out.dropna(subset=['last'])
+        self._quotes = (version, out)
+        return out
+
+    def quote(self, ticker, max_age=None):
+        """단일 종목 시세. max_age 지정 시 필요하면 먼저 갱신"""
+        ticker = ticker.upper()
+        if max_age is not None: self.ensure([ticker], max_age)
+        q = self.quotes()
+        if ticker not in q.index: return None
+        return q.loc[ticker].to_dict()
+
+market = MarketSnapshot()
+
+# ---------------------------------------------------------
+# [2-4] 지표 엔진 (전 종목 x 일자 행렬을 한 번에 계산)
+# ---------------------------------------------------------
+RSI_PERIOD = 14
+MA_SHORT, MA_LONG = 20, 60
+BB_PERIOD, BB_K = 20, 2.0
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+VOLUME_AVG_DAYS, VOLUME_MULT = 20, 2.0
+HIGH_52W_BARS = 252
+MOVE_PCT, MOVE_STEP = 3.0, 1.0        # 급등락 기준(%)과, 같은 종목 재알림에 필요한 추가 변동(%p)
+RSI_OB, RSI_OS = 70, 30
+RSI_RESET = (35, 65)                  # 이 구간으로 돌아와야 RSI 알림이 다시 울림
+
+# 규칙 -> 활성화 옵션 키
+RULE_OPTIONS = {
+    'move': "📈 급등락(3%)", 'rsi_ob': "📉 RSI", 'rsi_os': "📉 RSI",
+    'volume': "📊 거래량(2배)", 'new_high': "🚀 신고가",
+    'ma_golden': "〰️ MA크로스", 'ma_dead': "〰️ MA크로스",
+    'bb_upper': "🛁 볼린저", 'bb_lower': "🛁 볼린저",
+    'macd_up': "🌊 MACD", 'macd_down': "🌊 MACD",
+}
+# 규칙 -> (ind, 직전 급등락 %, RSI 상태, 앞서 계산된 마스크) -> 티커별 bool. 순서대로 평가 (rsi_os는 rsi_ob 참조)
+RULE_MASKS = {
+    'move': lambda ind, price_last, rsi_status, m: (ind['pct'].abs() >= MOVE_PCT) & ((ind['pct'] - price_last).abs() >= MOVE_STEP),
+    'rsi_ob': lambda ind, price_last, rsi_status, m: (ind['rsi'] >= RSI_OB) & (rsi_status != "OB"),
+    'rsi_os': lambda ind, price_last, rsi_status, m: (ind['rsi'] <= RSI_OS) & (rsi_status != "OS") & ~m['rsi_ob'],
+    'volume': lambda ind, *_: ind['vol_ratio'] >= VOLUME_MULT,
+    'new_high': lambda ind, *_: ind['last'] > ind['high_52w'],
+    'ma_golden': lambda ind, *_: (ind['ma_spread'] > 0) & (ind['ma_spread_prev'] <= 0),
+    'ma_dead': lambda ind, *_: (ind['ma_spread'] < 0) & (ind['ma_spread_prev'] >= 0),
+    'bb_upper': lambda ind, *_: ind['last'] > ind['bb_upper'],
+    'bb_lower': lambda ind, *_: ind['last'] < ind['bb_lower'],
+    'macd_up': lambda ind, *_: (ind['macd_hist'] > 0) & (ind['macd_hist_prev'] <= 0),
+    'macd_down': lambda ind, *_: (ind['macd_hist'] < 0) & (ind['macd_hist_prev'] >= 0),
+}
+DAILY_RULES = ['volume', 'new_high', 'ma_golden', 'ma_dead', 'bb_upper', 'bb_lower', 'macd_up', 'macd_down']
+
+def _window(frame, n, shift=0):
+    """끝에서 shift개를 뺀 직전 n개 행. 행이 모자라면 빈 프레임(-> 집계 시 NaN)"""
+    end = len(frame) - shift
+    return frame.iloc[end - n:end] if end >= n else frame.iloc[0:0]
+
+def _ewm(values, span):
+    """adjust=False 지수이동평균을 시간축으로만 순회 (티커 축은 한 번에 계산)"""
+    alpha = 2 / (span + 1)
+    out = np.empty_like(values); cur = values[0].copy()
+    for i, row in enumerate(values):
+        cur = np.where(np.isnan(cur), row, np.where(np.isnan(row), cur, cur + alpha * (row - cur)))
+        out[i] = cur
+    return out
+
+def compute_indicators(close, volume=None):
+    """(일자 x 티커) 종가/거래량 행렬 -> (티커 x 지표) 최신값 프레임.
+
+    알림에는 마지막(과 직전) 봉 값만 필요하므로 rolling 전체 대신 끝 구간만 열 단위로 집계한다.
+    """
+    close = close.ffill()
+    last, prev = close.iloc[-1], close.iloc[-2]
+
+    delta = _window(close, RSI_PERIOD + 1).diff().iloc[1:]
+    gain = delta.where(delta > 0, 0).mean(skipna=False); loss = (-delta.where(delta < 0, 0)).mean(skipna=False)
+    rsi = 100 - (100 / (1 + gain / loss))
+
+    ma = lambda n, shift=0: _window(close, n, shift).mean(skipna=False)
+    bb = _window(close, BB_PERIOD)
+    mid, sd = bb.mean(skipna=False), bb.std(skipna=False)
+
+    values = close.to_numpy(dtype=float)
+    macd = _ewm(values, MACD_FAST) - _ewm(values, MACD_SLOW)
+    hist = pd.DataFrame((macd - _ewm(macd, MACD_SIGNAL))[-2:], columns=close.columns)
+
+    ind = pd.DataFrame({
+        'last': last, 'pct': (last - prev) / prev * 100,
+        'rsi': rsi,
+        'ma_spread': ma(MA_SHORT) - ma(MA_LONG), 'ma_spread_prev': ma(MA_SHORT, 1) - ma(MA_LONG, 1),
+        'bb_upper': mid + BB_K * sd, 'bb_lower': mid - BB_K * sd,
+        'macd_hist': hist.iloc[-1], 'macd_hist_prev': hist.iloc[0],
+        'high_52w': _window(close, HIGH_52W_BARS, 1).max() if len(close) > HIGH_52W_BARS else close.iloc[:-1].max(),
+    })
+    if volume is not None and not volume.empty:
+        ind['vol_ratio'] = volume.iloc[-1] / _window(volume, VOLUME_AVG_DAYS, 1).mean()
+    else: ind['vol_ratio'] = float('nan')
+    return ind.dropna(subset=['last'])
+
+def evaluate_rules(ind, options, state, today):
+    """활성화된 규칙 전체를 (티커 x 규칙) bool 마스크로 평가.
+
+    options: (티커 x 옵션키) bool 프레임, state: {'price', 'rsi', 'signal'} 알림 이력.
+    급등락은 직전 알림 대비 MOVE_STEP%p, RSI는 RSI_RESET 복귀 전까지, 나머지는 하루 한 번만 울린다.
+    규칙마다 metrics 'rule' 종류로 평가 시간을 남긴다.
+    """
+    opts = options.reindex(ind.index).fillna(False).astype(bool)
+    price_last = pd.Series({t: p for t, (p, d) in state['price'].items() if d == today}, dtype=float).reindex(ind.index).fillna(0.0)
+    rsi_status = pd.Series(state['rsi'], dtype=object).reindex(ind.index).fillna("NORMAL")
+    watch = opts["🟢 감시"] if "🟢 감시" in opts else pd.Series(True, index=ind.index)
+    sent_today = {}
+    for (t, r), d in state['signal'].items():
+        if d == today: sent_today.setdefault(r, set()).add(t)
+
+    masks, fired = {}, {}
+    for rule, mask in RULE_MASKS.items():
+        with metrics.timer('rule', rule):
+            masks[rule] = mask(ind, price_last, rsi_status, masks)
+            key = RULE_OPTIONS[rule]
+            hit = masks[rule] & opts[key] & watch if key in opts else pd.Series(False, index=ind.index)
+            if rule in DAILY_RULES and rule in sent_today: hit &= ~ind.index.isin(list(sent_today[rule]))
+            fired[rule] = hit
+    return pd.DataFrame(fired, index=ind.index).fillna(False).astype(bool)
+
+def format_alert(ticker, rule, row):
+    """(메시지, parse_mode)"""
+    pct, last = row['pct'], row['last']
+    if rule == 'move': return f"🔔 *[{ticker}] {'급등 🚀' if pct>0 else '급락 📉'}*\n변동: {pct:.2f}%\n현재: ${last:.2f}", "Markdown"
+    if rule == 'rsi_ob': return f"🔥 [{ticker}] RSI 과매수 ({row['rsi']:.1f})", None
+    if rule == 'rsi_os': return f"💧 [{ticker}] RSI 과매도 ({row['rsi']:.1f})", None
+    if rule == 'volume': return f"📊 [{ticker}] 거래량 급증 ({row['vol_ratio']:.1f}배)", None
+    if rule == 'new_high': return f"🚀 [{ticker}] 52주 신고가 ${last:.2f} (이전 ${row['high_52w']:.2f})", None
+    if rule == 'ma_golden': return f"〰️ [{ticker}] 골든크로스 (MA{MA_SHORT} ↗ MA{MA_LONG})", None
+    if rule == 'ma_dead': return f"〰️ [{ticker}] 데드크로스 (MA{MA_SHORT} ↘ MA{MA_LONG})", None
+    if rule == 'bb_upper': return f"🛁 [{ticker}] 볼린저 상단 돌파 (${last:.2f} > ${row['bb_upper']:.2f})", None
+    if rule == 'bb_lower': return f"🛁 [{ticker}] 볼린저 하단 이탈 (${last:.2f} < ${row['bb_lower']:.2f})", None
+    if rule == 'macd_up': return f"🌊 [{ticker}] MACD 시그널 상향 돌파", None
+    if rule == 'macd_down': return f"🌊 [{ticker}] MACD 시그널 하향 돌파", None
+
+def collect_alerts(ind, fired, state, today):
+    """발화한 (종목, 규칙)만 꺼내 메시지로 만들고 알림 이력을 갱신"""
+    alerts = []
+    stacked = fired.stack()
+    for ticker, rule in stacked[stacked].index:
+        row = ind.loc[ticker]
+        alerts.append((ticker, rule) + format_alert(ticker, rule, row))
+        if rule == 'move': state['price'][ticker] = [row['pct'], today]
+        elif rule == 'rsi_ob': state['rsi'][ticker] = "OB"
+        elif rule == 'rsi_os': state['rsi'][ticker] = "OS"
+        else: state['signal'][(ticker, rule)] = today
+    # RSI 히스테리시스: RSI_RESET 구간으로 돌아오면 다시 알림 가능
+    for ticker in ind.index[(ind['rsi'] > RSI_RESET[0]) & (ind['rsi'] < RSI_RESET[1])]:
+        if state['rsi'].get(ticker, "NORMAL") != "NORMAL": state['rsi'][ticker] = "NORMAL"
+    # 지난 날짜의 1일 1회 기록과 급등락 기준 정리 (어제의 +3.2%가 오늘의 +3.9%를 막지 않도록)
+    for key in [k for k, d in state['signal'].items() if d != today]: del state['signal'][key]
+    for key in [t for t, (_, d) in state['price'].items() if d != today]: del state['price'][key]
+    return alerts
+
+def run_indicator_rules(index, token):
+    """스냅샷 전체에 대해 규칙을 한 번에 평가하고, 발화한 (종목, 규칙)을 구독 채팅방들에 발송"""
+    close = market.frame("Close")
+    if close.empty or len(close) < 2 or not index.options: return []
+    options = watchlist_frame(index.options)
+    tickers = [t for t in options.index if t in close.columns]
+    if not tickers: return []
+    with metrics.timer('stage', 'prices.indicators'):
+        ind = compute_indicators(close[tickers], market.frame("Volume").reindex(columns=tickers))
+    state = {'price': price_alert_cache, 'rsi': rsi_alert_status, 'signal': signal_alert_cache}
+    today = datetime.now().strftime('%Y-%m-%d')
+    with metrics.timer('stage', 'prices.rules'), alert_lock:
+        alerts = collect_alerts(ind, evaluate_rules(ind, options, state, today), state, today)
+        save_alert_state()
+    for ticker, rule, text, parse_mode in alerts:
+        metrics.count('alert', rule)
+        try:
+            for chat_id in index.chats(ticker, rule): send_telegram(token, chat_id, text, parse_mode)
+        except Exception as e: write_log(f"Alert Err: {e}", "ERROR", ticker=ticker, stage=rule)
+    return alerts
+
+def save_alert_state():
+    """알림 이력을 공유 저장소에 기록 (워커 재시작 후에도 같은 알림을 다시 보내지 않도록)"""
+    with alert_lock:
+        state = {'price': price_alert_cache, 'rsi': rsi_alert_status, 'eco': sorted(eco_alert_cache),
+                 'signal': {f"{t}|{r}": d for (t, r), d in signal_alert_cache.items()}}
+        try: state_store.put('alerts', state)
+        except Exception as e: write_log(f"Alert State Err: {e}", "ERROR", stage="alerts")
+
+def load_alert_state():
+    try: state, _ = state_store.get('alerts')
+    except Exception as e:
+        write_log(f"Alert State Err: {e}", "ERROR", stage="alerts"); return
+    if not state: return
+    with alert_lock:
+        # 날짜 없는 예전 형식(ticker -> %)은 언제 기준인지 알 수 없으므로 버림
+        price_alert_cache.update({t: v for t, v in state.get('price', {}).items() if isinstance(v, list)})
+        rsi_alert_status.update(state.get('rsi', {}))
+        signal_alert_cache.update({tuple(k.split('|', 1)): d for k, d in state.get('signal', {}).items()})
+        eco_alert_cache.update(state.get('eco', []))
+
+# ---------------------------------------------------------
+# [2-6] 미국 장 세션 캘린더 (가격/지표 폴링 주기를 세션에 맞춤)
+# ---------------------------------------------------------
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_HOURS = {'pre': 4 * 60, 'open': 9 * 60 + 30, 'close': 16 * 60, 'early_close': 13 * 60, 'after': 20 * 60}  # 뉴욕 기준 분
+SESSION_EDGE = 15   # 분. 개장 직후/마감 직전은 더 촘촘하게
+SESSION_LABELS = {'pre': "프리마켓", 'open': "개장 직후", 'regular': "정규장", 'close': "마감 직전",
+                  'after': "애프터마켓", 'closed': "장 마감", 'holiday': "휴장일"}
+SESSION_INTERVALS = {'pre': 300, 'open': 10, 'regular': 30, 'close': 10, 'after': 300, 'closed': 3600, 'holiday': 3600}  # 초
+TRADING_SESSIONS = ('open', 'regular', 'close')
+
+def _nth_weekday(year, month, weekday, n):
+    """n번째(음수면 뒤에서) 요일 날짜"""
+    if n > 0:
+        d = datetime(year, month, 1).date()
+        return d + timedelta(days=(weekday - d.weekday()) % 7 + 7 * (n - 1))
+    d = (datetime(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)).date()
+    return d - timedelta(days=(d.weekday() - weekday) % 7)
+
+def _easter(year):
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return datetime(year, month, (h + l - 7 * m + 33 * month + 19) % 32).date()
+
+def _observed(d):
+    return d - timedelta(days=1) if d.weekday() == 5 else d + timedelta(days=1) if d.weekday() == 6 else d
+
+@functools.lru_cache(maxsize=8)
+def market_holidays(year):
+    """NYSE 휴장일 (주말이면 대체일). 1/1이 토요일이면 전년 12/31은 정상 개장"""
+    day = lambda m, d: datetime(year, m, d).date()
+    days = {_nth_weekday(year, 1, 0, 3), _nth_weekday(year, 2, 0, 3), _easter(year) - timedelta(days=2),
+            _nth_weekday(year, 5, 0, -1), _observed(day(7, 4)), _nth_weekday(year, 9, 0, 1),
+            _nth_weekday(year, 11, 3, 4), _observed(day(12, 25))}
+    if day(1, 1).weekday() != 5: days.add(_observed(day(1, 1)))
+    if year >= 2022: days.add(_observed(day(6, 19)))
+    return frozenset(days)
+
+@functools.lru_cache(maxsize=8)
+def market_early_closes(year):
+    """13시 조기 마감: 독립기념일 전날, 추수감사절 다음 날, 크리스마스 이브"""
+    days = {datetime(year, 7, 3).date(), _nth_weekday(year, 11, 3, 4) + timedelta(days=1), datetime(year, 12, 24).date()}
+    return frozenset(d for d in days if d.weekday() < 5 and d not in market_holidays(year))
+
+def is_trading_day(d):
+    return d.weekday() < 5 and d not in market_holidays(d.year)
+
+def market_session(now=None):
+    """(세션 이름, 세션이 끝나는 시각). now는 tz-aware (없으면 현재). 리플레이/테스트용으로 시각 주입 가능"""
+    now = (now or datetime.now(timezone.utc)).astimezone(MARKET_TZ)
+    today = now.date()
+    def at(d, minutes): return datetime(d.year, d.month, d.day, minutes // 60, minutes % 60, tzinfo=MARKET_TZ)
+    def next_pre(d):
+        d += timedelta(days=1)
+        while not is_trading_day(d): d += timedelta(days=1)
+        return at(d, MARKET_HOURS['pre'])
+    if not is_trading_day(today):
+        return ('holiday' if today.weekday() < 5 else 'closed'), next_pre(today)
+    close = MARKET_HOURS['early_close' if today in market_early_closes(today.year) else 'close']
+    bounds = [(MARKET_HOURS['pre'], 'pre'), (MARKET_HOURS['open'], 'open'), (MARKET_HOURS['open'] + SESSION_EDGE, 'regular'),
+              (close - SESSION_EDGE, 'close'), (close, 'after'), (MARKET_HOURS['after'], 'closed')]
+    minute = now.hour * 60 + now.minute
+    if minute < bounds[0][0]: return 'closed', at(today, bounds[0][0])
+    for (start, name), nxt in zip(bounds, bounds[1:] + [(None, None)]):
+        if nxt[0] is None: return name, next_pre(today)
+        if minute < nxt[0]: return name, at(today, nxt[0])
+
+def session_interval(now=None):
+    """가격/지표 폴링 주기(초). 세션이 바뀌는 시각을 넘겨 자지 않도록 경계까지로 자름"""
+    now = now or datetime.now(timezone.utc)
+    name, ends = market_session(now)
+    return max(1.0, min(SESSION_INTERVALS[name], (ends - now).total_seconds() + 1))
+
+def session_max_age(now=None):
+    """명령어/화면이 스냅샷을 재사용해도 되는 시간. 장이 닫혀 있으면 가격이 안 움직이므로 길게"""
+    name, _ = market_session(now)
+    return SNAPSHOT_MAX_AGE if name in TRADING_SESSIONS else SESSION_INTERVALS[name]
+
+# ---------------------------------------------------------
+# [2-5] 모니터 작업 + asyncio 스케줄러 (소스별 독립 주기)
+# ---------------------------------------------------------
+MONITOR_INTERVALS = {'news': 300, 'eco': 3600, 'digest': 60, 'finviz': 1800}  # 초
+MONITOR_JITTER = 0.1          # 주기의 ±10% 범위에서 실행 시각을 흔들어 요청 몰림 방지
+HOST_CONCURRENCY = {'news.google.com': 4, 'finviz.com': 2, YAHOO_HOST: 1}
+DEFAULT_HOST_CONCURRENCY = 4
+SCHEDULER_WORKERS = 16
+
+class Scheduler:
+    """작업마다 독립 주기로 도는 asyncio 스케줄러.
+
+    블로킹 작업은 스레드 풀에서 실행하되 호스트별 세마포어로 동시 요청 수를 제한한다.
+    실행이 주기를 넘기면 밀린 회차는 건너뛰어(skip) 겹쳐 돌지 않는다.
+    """
+    def __init__(self, workers=SCHEDULER_WORKERS):
+        self.jobs = {}
+        self.semaphores = {}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="DeBrief_Job")
+        self.loop = None
+
+    def add_job(self, name, interval, fn, host=None):
+        """fn은 코루틴 함수(fn(scheduler)) 또는 인자 없는 블로킹 함수. interval이 함수면 매 회차 주기를 다시 물음"""
+        schedule = interval if callable(interval) else None
+        self.jobs[name] = {'interval': schedule() if schedule else interval, 'schedule': schedule, 'fn': fn, 'host': host,
+                           'runs': 0, 'skipped': 0, 'errors': 0, 'last_duration': 0.0, 'last_run': None}
+
+    def host_slot(self, host):
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY))
+        return self.semaphores[host]
+
+    async def run_blocking(self, fn, *args, host=None):
+        if host is None: return await self.loop.run_in_executor(self.executor, fn, *args)
+        async with self.host_slot(host):
+            return await self.loop.run_in_executor(self.executor, fn, *args)
+
+    async def _run_job(self, name):
+        job = self.jobs[name]; interval = job['interval']
+        await asyncio.sleep(random.uniform(0, interval * MONITOR_JITTER))  # 작업 간 시작 시각 분산
+        next_at = self.loop.time()
+        while True:
+            started = self.loop.time(); failed = False
+            try:
+                if asyncio.iscoroutinefunction(job['fn']): await job['fn'](self)
+                else: await self.run_blocking(job['fn'], host=job['host'])
+            except Exception as e:
+                job['errors'] += 1; failed = True
+                write_log(f"Job Err: {e}", "ERROR", stage=name, duration=self.loop.time() - started)
+            now = self.loop.time()
+            metrics.observe('stage', name, now - started, error=failed)
+            write_log("Job 완료", "DEBUG", stage=name, duration=now - started)
+            job['runs'] += 1; job['last_duration'] = now - started; job['last_run'] = datetime.now()
+            if job['schedule']:
+                try: interval = job['interval'] = job['schedule']()
+                except Exception as e: write_log(f"Schedule Err: {e}", "ERROR", stage=name)   # 직전 주기 유지
+            next_at += interval
+            if now > next_at:
+                missed = int((now - next_at) // interval) + 1
+                job['skipped'] += missed; next_at += missed * interval
+                write_log(f"Job Overrun: {missed}회 건너뜀", "WARN", stage=name, duration=now - started)
+            jitter = random.uniform(-1, 1) * interval * MONITOR_JITTER
+            await asyncio.sleep(max(0.0, next_at - now + jitter))
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        await asyncio.gather(*(self._run_job(name) for name in self.jobs))
+
+    def start(self):
+        t = threading.Thread(target=lambda: asyncio.run(self._main()), daemon=True, name="DeBrief_Worker")
+        t.start()
+        return t
+
+    def stats(self):
+        return {n: {k: v for k, v in j.items() if k not in ('fn', 'host', 'schedule')} for n, j in self.jobs.items()}
+
+def fetch_ticker_news(ticker):
+    with metrics.timer('stage', 'news.fetch'):
+        try: return fetch_news(ticker, False)
+        except Exception as e:
+            write_log(f"News Err: {e}", "ERROR", ticker=ticker, stage="news"); return []
+
+def monitor_prices():
+    """감시 종목 전체를 한 번에 갱신하고 가격/지표 규칙 평가.
+
+    대시보드 카드(기본 채팅방 목록, 🟢 감시 꺼진 종목 포함)도 시세는 같이 유지한다. 규칙은 감시 종목만.
+    """
+    if not config_store.get('system_active', True): return
+    index = subscriber_index()
+    shown = sorted(set(index.tickers()) | set(config_store.get('tickers', {})))
+    if not shown: return
+    with metrics.timer('stage', 'prices.snapshot'):
+        market.retain(shown); market.refresh(shown)
+    run_indicator_rules(index, config_store.get('telegram')['bot_token'])
+
+async def monitor_news(sched):
+    """종목별 뉴스 확인 (구독자 수와 관계없이 종목당 한 번). news.google.com 동시 요청 수는 HOST_CONCURRENCY로 제한.
+
+    전 종목을 받은 뒤 새 항목만 골라, 그 제목들을 회차당 translate_many 한 번으로 번역해 발송한다.
+    """
+    if not config_store.get('system_active', True): return
+    index = subscriber_index(); token = config_store.get('telegram')['bot_token']
+    tickers = index.tickers(*NEWS_RULES)
+    results = await asyncio.gather(*(sched.run_blocking(fetch_ticker_news, t, host='news.google.com') for t in tickers))
+    fresh = []
+    for ticker, items in zip(tickers, results):
+        for item in items:
+            rule = 'sec' if "SEC" in item['raw_title'] or "8-K" in item['raw_title'] else 'news'
+            chats = index.chats(ticker, rule)
+            if chats and news_index.claim(ticker, item['link'], item['raw_title']): fresh.append((ticker, rule, item, chats))
+    if not fresh: return
+    with metrics.timer('stage', 'news.translate'):
+        await sched.run_blocking(translate_titles, [item for _, _, item, _ in fresh], "📰")
+    for ticker, rule, item, chats in fresh:
+        prefix = "🏛️" if rule == 'sec' else "📰"
+        metrics.count('alert', rule)
+        for chat_id in chats:
+            send_telegram(token, chat_id, f"🔔 {prefix} *[{ticker}]*\n`[{item['date']}]` [{item['title']}]({item['link']})", "Markdown")
+
+async def monitor_finviz(sched):
+    """감시 종목의 Finviz 스냅샷 중 TTL이 지난 것만 백그라운드에서 일괄 갱신. 차단 중에는 기존 캐시를 그대로 둠"""
+    if not http.breaker('finviz.com').available(): return
+    tickers = subscriber_index().tickers()
+    fetch = functools.partial(finviz.get, fallback=False)
+    await asyncio.gather(*(sched.run_blocking(fetch, t, host='finviz.com') for t in finviz.stale(tickers)))
+
+ECO_POLL_INTERVAL = 30   # 초. 발표 시각 이후 실제값 확인 간격
+ECO_POLL_TRIES = 10      # 이 횟수 안에 실제값이 없으면 실제값 없이 알림
+
+class EcoReleaseScheduler:
+    """High/Medium 일정을 발표 시각 기준 힙에 올려 두고, 그 시각에 깨어나 발표 알림.
+
+    매 주기 전체 목록을 훑지 않고 가장 이른 발표 시각까지만 대기한다.
+    faireconomy 주간 XML은 <actual>을 싣지 않으므로 그 경우 재조회 없이 바로 알리고,
+    <actual> 필드가 있는 피드만 값이 채워질 때까지 잠깐 폴링한다.
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.heap = []          # (발표 시각 ts, id)
+        self.queued = set()
+        self.thread = None
+
+    def sync(self, events):
+        now = time.time()
+        with self.cond:
+            for e in events:
+                if not e['release_at'] or e['id'] in self.queued or e['id'] in eco_alert_cache: continue
+                ts = e['release_at'].timestamp()
+                if ts < now - ECO_POLL_INTERVAL * ECO_POLL_TRIES: continue
+                heapq.heappush(self.heap, (ts, e['id'])); self.queued.add(e['id'])
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True, name="DeBrief_EcoRelease")
+                self.thread.start()
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if not self.heap: self.cond.wait(); continue
+                wait = self.heap[0][0] - time.time()
+                if wait > 0: self.cond.wait(timeout=wait); continue
+                due = set()
+                while self.heap and self.heap[0][0] <= time.time() + 1:
+                    due.add(heapq.heappop(self.heap)[1])
+            threading.Thread(target=self._poll, args=(due,), daemon=True).start()
+
+    def _poll(self, ids):
+        """같은 시각 발표분을 묶어 알림. 실제값 필드가 있는 피드면 채워질 때까지 재검증"""
+        pending = set(ids); last = {}
+        for attempt in range(ECO_POLL_TRIES):
+            if attempt: time.sleep(ECO_POLL_INTERVAL)
+            try: events = eco_calendar.refresh() if attempt else get_economic_events()
+            except Exception as e:
+                write_log(f"Eco Poll Err: {e}", "ERROR", stage="eco"); continue
+            events = {e['id']: e for e in events}
+            for eid in list(pending):
+                e = events.get(eid)
+                if e is None: pending.discard(eid); continue
+                last[eid] = e
+                if e['actual'] == "": continue   # 필드는 있는데 아직 비어 있음 -> 다음 시도
+                pending.discard(eid); self._alert(e)
+            if not pending: break
+        for eid in pending & last.keys(): self._alert(last[eid])   # 끝내 비어 있으면 예상/이전만으로 알림
+        with self.cond: self.queued -= set(ids)
+
+    def _alert(self, e):
+        with alert_lock: eco_alert_cache.add(e['id']); save_alert_state()
+        chats = subscriber_index().eco_chats
+        if not chats: return
+        metrics.count('alert', 'eco')
+        icon = "🔥" if e['impact'] == 'High' else "🔸"
+        actual = f"실제: `{e['actual']}` " if e['actual'] else ""
+        msg = f"{icon} *{e['event']}* 발표\n{actual}(예상: {e['forecast'] or '-'}, 이전: {e['previous'] or '-'})"
+        if e['url']: msg += f"\n[상세]({e['url']})"
+        token = config_store.get('telegram')['bot_token']
+        for chat_id in chats: send_telegram(token, chat_id, msg, "Markdown")
+
+eco_releases = EcoReleaseScheduler()
+
+def monitor_eco():
+    """주간 경제 캘린더 재검증 후 발표 시각 타이머 갱신"""
+    if subscriber_index().eco_chats: eco_releases.sync(get_economic_events())
+
+digest_state = {'weekly': None, 'daily': None}
+
+def monitor_digest():
+    """월요일 08시 주간 일정, 매일 08시 당일 일정 발송"""
+    chats = subscriber_index().eco_chats
+    if not chats: return
+    token = config_store.get('telegram')['bot_token']
+    now = datetime.now(); today = now.strftime('%Y-%m-%d')
+    if now.hour != 8: return
+    if now.weekday() == 0 and digest_state['weekly'] != today:
+        events = get_economic_events()
+        highs = [e for e in events if e['impact'] == 'High']
+        if highs:
+            msg = "📅 *이번 주 주요 경제 일정*\n────────────────"
+            for e in highs: msg += f"\n🗓️ `{e['date']} {e['time']}`\n🔥 {e['event']}"
+            for chat_id in chats: send_telegram(token, chat_id, msg, "Markdown")
+            digest_state['weekly'] = today
+    if digest_state['daily'] != today:
+        events = get_economic_events()
+        todays = [e for e in events if e['day'] == today]
+        if todays:
+            msg = f"☀️ *오늘({today}) 주요 일정*\n────────────────"
+            for e in todays:
+                t_str = e['release_at'].astimezone().strftime('%H:%M') if e['release_at'] else e['time']
+                msg += f"\n⏰ {t_str} : {e['event']} (예상:{e['forecast']})"
+            for chat_id in chats: send_telegram(token, chat_id, msg, "Markdown")
+            digest_state['daily'] = today
+
+def start_monitor():
+    sched = Scheduler()
+    # 가격/지표는 장 세션에 따라 (장중 10~30초, 프리/애프터 5분, 휴장 1시간), 뉴스 등은 고정 주기
+    sched.add_job('prices', session_interval, monitor_prices, host=YAHOO_HOST)
+    sched.add_job('news', MONITOR_INTERVALS['news'], monitor_news)
+    sched.add_job('eco', MONITOR_INTERVALS['eco'], monitor_eco, host='nfs.faireconomy.media')
+    sched.add_job('digest', MONITOR_INTERVALS['digest'], monitor_digest)
+    sched.add_job('finviz', MONITOR_INTERVALS['finviz'], monitor_finviz)
+    sched.start()
+    return sched
+
+# ---------------------------------------------------------
+# [3] 텔레그램 봇
+# ---------------------------------------------------------
+LOOKUP_TTL = {'p': 15, 'summary': 60, 'earning': 3600, 'news': 120, 'sec': 300}   # 초. 명령어별 응답 재사용 기간
+LOOKUP_CACHE_SIZE = 2000
+LOOKUP_WAIT = 30   # 초. 같은 조회를 먼저 시작한 호출을 기다리는 최대 시간
+
+class LookupCache:
+    """봇 명령어 조회 결과의 짧은 TTL 캐시 + 단일 비행(single-flight).
+
+    같은 키를 동시에 요청하면 첫 호출만 실제로 조회하고 나머지는 그 결과를 함께 받는다.
+    None(정보 없음/실패)은 캐시하지 않는다.
+    """
+    def __init__(self, maxsize=LOOKUP_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()   # key -> (만료 시각, 값)
+        self.inflight = {}           # key -> Future
+
+    def get(self, key, fn, ttl):
+        kind = key[0]
+        with self.lock:
+            hit = self.cache.get(key)
+            if hit and hit[0] > time.time():
+                self.cache.move_to_end(key)
+                metrics.count('cache', f"{kind}.hit")
+                return hit[1]
+            fut = self.inflight.get(key); leader = fut is None
+            if leader: fut = self.inflight[key] = Future()
+        if not leader:
+            metrics.count('cache', f"{kind}.shared")
+            return fut.result(timeout=LOOKUP_WAIT)
+        metrics.count('cache', f"{kind}.miss")
+        try: value = fn()
+        except BaseException as e:
+            with self.lock: self.inflight.pop(key, None)
+            fut.set_exception(e)
+            raise
+        with self.lock:
+            self.inflight.pop(key, None)
+            if value is not None:
+                self.cache[key] = (time.time() + ttl, value); self.cache.move_to_end(key)
+                while len(self.cache) > self.maxsize: self.cache.popitem(last=False)
+        fut.set_result(value)
+        return value
+
+lookups = LookupCache()
+
+def lookup(cmd, ticker, fn):
+    return lookups.get((cmd, ticker), fn, LOOKUP_TTL[cmd])
+
+def ticker_quote(t):
+    """감시 종목은 스냅샷(모니터가 session_max_age 안에 받았으면 그대로, 장이 닫혀 있으면 더 오래 재사용),
+    그 밖의 종목은 스냅샷에 올리지 않는 단건 조회"""
+    if t not in subscriber_index().options: return lookup('p', t, lambda: market.spot(t))
+    max_age = session_max_age()
+    return market.quote(t) if not market.stale([t], max_age) else lookup('p', t, lambda: market.quote(t, max_age=max_age))
+
+def quote_reply(t):
+    """/p 응답"""
+    q = ticker_quote(t)
+    return f"💰 *{t}*: `${q['last']:.2f}` ({q['pct']:+.2f}%)" if q else None
+
+def earning_reply(t):
+    data = get_finviz_data(t)
+    if data and data.earnings:
+        e_date = data.earnings
+        clean_date = e_date.replace(' BMO','').replace(' AMC','')
+        time_icon = "☀️ 장전" if "BMO" in e_date else "🌙 장후" if "AMC" in e_date else ""
+        return f"📅 *{t} 실적 발표*\n🗓️ 일시: `{clean_date}` {time_icon}\nℹ️ 출처: Finviz"
+    try:
+        dates = http.guarded(YAHOO_HOST, lambda: yf.Ticker(t).earnings_dates)
+        if dates is not None and not dates.empty:
+            if dates.index.tz is not None: dates.index = dates.index.tz_localize(None)
+            target = dates.index[0]
+            return f"📅 *{t} 실적 발표*\n🗓️ 일시: `{target.strftime('%Y-%m-%d')}`\n(Yfinance)"
+    except: pass
+    return None
+
+def summary_reply(t):
+    d = get_finviz_data(t)
+    try: curr_p = ticker_quote(t)['last']
+    except: curr_p = None
+    d = d or FinvizSnapshot(t)
+    fmt = lambda x: f"{x:.2f}" if x is not None else 'N/A'
+    price = fmt(curr_p or d.price)
+    pe = fmt(d.pe); pbr = fmt(d.pb)
+    cap = d.market_cap or 'N/A'; target = fmt(d.target_price)
+    if cap == 'N/A':
+        # 시가총액은 OHLCV에 없으므로 Finviz 실패 시에만 개별 조회
+        try: cap = f"${http.guarded(YAHOO_HOST, lambda: yf.Ticker(t).fast_info.market_cap)/1e9:.2f}B"
+        except: pass
+    source = "\nℹ️ Finviz 응답 없음 · Yahoo 값" if d.source == 'yahoo' else ""
+    return (f"📊 *{t} 재무 요약*\n💰 현재가: `${price}`\n🏢 시가총액: `{cap}`\n📈 PER: `{pe}`\n📚 PBR: `{pbr}`\n🎯 목표주가: `${target}`{source}")
+
+def news_reply(t, is_sec=False):
+    items = get_integrated_news(t, is_sec)
+    if not items: return None
+    if is_sec:
+        msg = [f"🏛️ *{t} SEC*"]
+        for i in items: msg.append(f"▪️ `[{i['date']}]` [{i['title'].replace('🏛️ ','').replace('[','').replace(']','')}]({i['link']})")
+    else:
+        msg = [f"📰 *{t} News*"]
+        for i in items: msg.append(f"▪️ `[{i['date']}]` [{i['title'].replace('[','').replace(']','')}]({i['link']})")
+    return "\n\n".join(msg)
+
+STATS_ROWS = 8   # /stats 에서 종류별로 보여 줄 항목 수 (호출 수 순)
+
+def format_stats():
+    """/stats 메시지: 종류별 상위 항목의 호출 수, 오류 수, p50/p95/p99 (ms)"""
+    snap = metrics.snapshot()
+    lines = ["📈 *DeBrief Stats*"]
+    for kind, title in METRIC_KINDS.items():
+        rows = sorted(((k[1], v) for k, v in snap.items() if k[0] == kind), key=lambda x: -x[1]['count'])[:STATS_ROWS]
+        if not rows: continue
+        lines.append(f"\n*{title}*\n```")
+        for name, v in rows:
+            lat = f" {v['p50']*1000:6.0f} {v['p95']*1000:6.0f} {v['p99']*1000:6.0f}" if v['timed'] else ""
+            lines.append(f"{name[:24]:<24} {v['count']:>6} {v['errors']:>3}{lat}")
+        lines.append("```")
+    if len(lines) == 1: lines.append("아직 수집된 지표 없음")
+    else: lines.append("_열: 횟수 / 오류 / p50 p95 p99 (ms)_")
+    blocked = [f"{h} ({b['state']}, {b['retry_in']:.0f}s)" for h, b in http.breakers_snapshot().items() if b['state'] != 'closed']
+    if blocked: lines.append("⛔ 차단 중: " + ", ".join(blocked))
+    return "\n".join(lines)
+
+def register_bot_handlers(bot):
+    """명령어 핸들러 등록 (실제 봇과 벤치마크용 가짜 봇 모두 사용). 명령어마다 소요 시간을 metrics에 기록"""
+    def handler(*commands):
+        def register(fn):
+            @functools.wraps(fn)
+            def timed(m):
+                with metrics.timer('command', commands[0]): return fn(m)
+            return bot.message_handler(commands=list(commands))(timed)
+        return register
+
+    @handler('start', 'help')
+    def start_cmd(m): 
+        msg = ("🤖 *DeBrief V55*\n"
+               "/on : 시스템 켜기 (복구됨)\n"
+               "/off : 시스템 끄기 (복구됨)\n"
+               "/earning [티커] : 실적발표\n"
+               "/summary [티커] : 재무요약\n"
+               "/eco : 경제지표\n"
+               "/news [티커] : 뉴스\n"
+               "/sec [티커] : 공시\n"
+               "/p [티커] : 현재가\n"
+               "/list : 감시목록\n"
+               "/add [티커 ...] : 추가 (여러 개 가능)\n"
+               "/del [티커 ...] : 삭제 (여러 개 가능)\n"
+               "/subscribe : 이 채팅방 구독\n"
+               "/unsubscribe : 구독 해제\n"
+               "/stats : 실행 지표\n"
+               "/ping : 생존확인")
+        bot.reply_to(m, msg, parse_mode='Markdown')
+
+    # [복구] on/off 명령어 (즉시 반영)
+    @handler('on')
+    def on_cmd(m):
+        if not chat_allowed(config_store.snapshot(), m.chat.id): return bot.reply_to(m, "⛔ 허용되지 않은 채팅방")
+        config_store.update(lambda c: c.__setitem__('system_active', True))
+        bot.reply_to(m, "🟢 시스템 가동 (모니터링 시작)")
+
+    @handler('off')
+    def off_cmd(m):
+        if not chat_allowed(config_store.snapshot(), m.chat.id): return bot.reply_to(m, "⛔ 허용되지 않은 채팅방")
+        config_store.update(lambda c: c.__setitem__('system_active', False))
+        bot.reply_to(m, "⛔ 시스템 정지 (모니터링 중단)")
+
+    @handler('earning', '실적')
+    def earning_cmd(m):
+        try:
+            parts = m.text.split()
+            if len(parts) < 2: return bot.reply_to(m, "사용법: /earning [티커]")
+            t = parts[1].upper()
+            bot.send_chat_action(m.chat.id, 'typing')
+            msg = lookup('earning', t, lambda: earning_reply(t))
+            if msg: bot.reply_to(m, msg, parse_mode='Markdown')
+            else: bot.reply_to(m, f"❌ {t}: 정보 없음.")
+        except: bot.reply_to(m, "오류 발생")
+
+    @handler('summary', '요약')
+    def summary_cmd(m):
+        try:
+            parts = m.text.split()
+            if len(parts) < 2: return bot.reply_to(m, "사용법: /summary [티커]")
+            t = parts[1].upper()
+            bot.send_chat_action(m.chat.id, 'typing')
+            bot.reply_to(m, lookup('summary', t, lambda: summary_reply(t)), parse_mode='Markdown')
+        except: bot.reply_to(m, "오류 발생")
+
+    @handler('eco')
+    def eco_cmd(m):
+        try:
+            bot.send_chat_action(m.chat.id, 'typing')
+            events = get_economic_events()
+            if not events: return bot.reply_to(m, "❌ 일정 없음")
+            msg = "📅 *주요 경제 일정 (USD)*\n────────────────"
+            c=0
+            for e in events:
+                icon = "🔥" if e['impact'] == 'High' else "🔸"
+                fcst = f"(예상:{e['forecast']})" if e['forecast'] else ""
+                msg += f"\n{icon} `{e['date']} {e['time']}`\n*{e['event']}* {fcst}\n"
+                c+=1
+                if c>=15: break
+            bot.reply_to(m, msg, parse_mode='Markdown')
+        except: pass
+
+    @handler('news')
+    def news_cmd(m):
+        try:
+            t = m.text.split()[1].upper()
+            msg = lookup('news', t, lambda: news_reply(t))
+            if not msg: return bot.reply_to(m, "뉴스 없음")
+            bot.reply_to(m, msg, parse_mode='Markdown', disable_web_page_preview=True)
+        except: pass
+
+    @handler('sec')
+    def sec_cmd(m):
+        try:
+            t = m.text.split()[1].upper()
+            msg = lookup('sec', t, lambda: news_reply(t, True))
+            if msg: bot.reply_to(m, msg, parse_mode='Markdown', disable_web_page_preview=True)
+            else: bot.reply_to(m, f"❌ {t} 공시 없음")
+        except: pass
+
+    @handler('p')
+    def p_cmd(m):
+        try:
+            t = m.text.split()[1].upper()
+            msg = quote_reply(t)
+            if msg: bot.reply_to(m, msg, parse_mode='Markdown')
+            else: bot.reply_to(m, f"❌ {t}: 시세 없음")
+        except: pass
+
+    # 감시 목록은 명령을 보낸 채팅방 기준 (기본 채팅방은 기존 목록, 그 밖은 구독자 목록)
+    @handler('list')
+    def list_cmd(m):
+        try:
+            wl = chat_watchlist(config_store.snapshot(), m.chat.id) or {}   # 사본: 동시에 /add, /del 이 와도 안전
+            bot.reply_to(m, f"📋 목록: {', '.join(wl.keys())}" if wl else "📋 목록 없음 (/add [티커])")
+        except Exception as e: write_log(f"List Err: {e}", "ERROR", stage="command")
+
+    # /add, /del 은 여러 종목을 한 번에 (공백/쉼표 구분). 저장은 한 번
+    def parse_tickers(text):
+        return [t.strip().upper() for t in re.split(r"[\s,]+", text.split(maxsplit=1)[1]) if t.strip()]
+
+    @handler('add')
+    def add_cmd(m):
+        try:
+            ts = parse_tickers(m.text)
+            if not chat_allowed(config_store.snapshot(), m.chat.id): return bot.reply_to(m, "⛔ 허용되지 않은 채팅방")
+            added = config_store.update(lambda c: bulk_add(chat_watchlist(c, m.chat.id, create=True), ts))
+            if added: bot.reply_to(m, f"✅ {', '.join(added)} 추가됨")
+        except: pass
+
+    @handler('del')
+    def del_cmd(m):
+        try:
+            ts = parse_tickers(m.text)
+            removed = config_store.update(lambda c: bulk_remove(chat_watchlist(c, m.chat.id) or {}, ts))
+            if removed: bot.reply_to(m, f"🗑️ {', '.join(removed)} 삭제됨")
+        except: pass
+
+    @handler('subscribe')
+    def subscribe_cmd(m):
+        try:
+            if not chat_allowed(config_store.snapshot(), m.chat.id): return bot.reply_to(m, "⛔ 허용되지 않은 채팅방")
+            def sub(c):
+                if chat_watchlist(c, m.chat.id) is not None: return False
+                chat_watchlist(c, m.chat.id, create=True)
+            if config_store.update(sub) is False: bot.reply_to(m, "이미 구독 중입니다. /add [티커]")
+            else: bot.reply_to(m, "✅ 구독 시작. /add [티커] 로 감시 종목을 추가하세요.")
+        except: pass
+
+    @handler('unsubscribe')
+    def unsubscribe_cmd(m):
+        try:
+            chat_id = str(m.chat.id)
+            if config_store.update(lambda c: c.get('subscribers', {}).pop(chat_id, None) is not None):
+                bot.reply_to(m, "👋 구독 해제됨")
+            else: bot.reply_to(m, "구독 중이 아닙니다 (기본 채팅방은 해제 불가)")
+        except: pass
+
+    @handler('ping')
+    def ping_cmd(m): bot.reply_to(m, "🏓 Pong! 정상.")
+
+    @handler('stats')
+    def stats_cmd(m):
+        try: bot.reply_to(m, format_stats(), parse_mode='Markdown')
+        except Exception as e: write_log(f"Stats Err: {e}", "ERROR", stage="command")
+
+# ---------------------------------------------------------
+# [3-1] 웹훅 모드 (st.secrets telegram.webhook_url 이 있을 때만, 없으면 기존 롱폴링)
+# ---------------------------------------------------------
+WEBHOOK_HOST = '127.0.0.1'   # 외부 공개는 리버스 프록시(https)가 담당
+WEBHOOK_PORT = 8443
+WEBHOOK_WORKERS = 4          # 핸들러 동시 실행 수
+WEBHOOK_BACKLOG = 64         # 처리 대기 업데이트 상한. 넘치면 503 -> Telegram이 나중에 재전송
+WEBHOOK_MAX_BODY = 1 << 20
+
+def webhook_settings(token):
+    """{'url','port','secret'} 또는 None (웹훅 미설정)"""
+    try:
+        sec = st.secrets["telegram"] if "telegram" in st.secrets else {}
+        if not sec.get("webhook_url"): return None
+        # secret_token: A-Z a-z 0-9 _ - 만 허용. 미지정 시 토큰에서 유도
+        secret = sec.get("webhook_secret") or hashlib.sha256(f"debrief:{token}".encode()).hexdigest()
+        return {'url': sec["webhook_url"], 'port': int(sec.get("webhook_port", WEBHOOK_PORT)), 'secret': secret}
+    except Exception: return None
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        srv = self.server
+        if self.headers.get('X-Telegram-Bot-Api-Secret-Token') != srv.secret:
+            self.send_error(403); return
+        length = int(self.headers.get('Content-Length') or 0)
+        if not 0 < length <= WEBHOOK_MAX_BODY:
+            self.send_error(413 if length else 400); return
+        body = self.rfile.read(length)
+        if not srv.slots.acquire(blocking=False):
+            metrics.observe('stage', 'webhook.rejected', error=True)
+            self.send_error(503); return
+        try: update = telebot.types.Update.de_json(body.decode('utf-8'))
+        except Exception:
+            srv.slots.release(); self.send_error(400); return
+        srv.pool.submit(srv.process, update)
+        self.send_response(200); self.send_header('Content-Length', '0'); self.end_headers()
+
+    def log_message(self, *args): pass
+
+class WebhookServer(ThreadingHTTPServer):
+    """Telegram 웹훅 수신. 요청 스레드는 파싱만 하고 바로 200, 핸들러는 고정 크기 풀에서 실행"""
+    daemon_threads = True
+
+    def __init__(self, bot, secret, port=WEBHOOK_PORT):
+        super().__init__((WEBHOOK_HOST, port), WebhookHandler)
+        self.bot = bot
+        self.secret = secret
+        self.pool = ThreadPoolExecutor(max_workers=WEBHOOK_WORKERS, thread_name_prefix="DeBrief_Webhook")
+        self.slots = threading.BoundedSemaphore(WEBHOOK_BACKLOG)
+
+    def process(self, update):
+        try:
+            with metrics.timer('stage', 'webhook.update'): self.bot.process_new_updates([update])
+        except Exception as e: write_log(f"Webhook Err: {e}", "ERROR", stage="webhook")
+        finally: self.slots.release()
+
+def run_webhook(bot, hook):
+    """웹훅 등록 후 서버를 이 스레드에서 실행 (run_bot_system의 롱폴링 루프 대신)"""
+    server = WebhookServer(bot, hook['secret'], hook['port'])
+    try: bot.set_webhook(url=hook['url'], secret_token=hook['secret'], allowed_updates=['message'],
+                         max_connections=WEBHOOK_WORKERS * 2, drop_pending_updates=True)
+    except Exception:
+        server.server_close(); server.pool.shutdown(wait=False); raise
+    write_log(f"🌐 웹훅 모드: {hook['url']} -> {WEBHOOK_HOST}:{hook['port']}", stage="webhook")
+    write_log("📡 봇 명령 수신 시작", stage="startup", duration=time.perf_counter() - PROCESS_STARTED)
+    server.serve_forever()
+
+def run_bot_system():
+    time.sleep(1)
+    if not claim_worker():
+        write_log("다른 프로세스가 워커 실행 중, 이 프로세스는 모니터/봇을 시작하지 않음", "WARN", stage="worker"); return
+    write_log("🤖 봇 시스템 시작...")
+    warm_imports()   # 설정 로드/텔레그램 연결과 나란히 데이터 스택을 데움
+    load_alert_state()
+    migrate_news_history()
+    cfg = load_config()
+    token = cfg['telegram']['bot_token']
+    chat_id = cfg['telegram']['chat_id']
+    if not token: return
+    
+    hook = webhook_settings(token)
+    try:
+        # 웹훅 모드에선 WebhookServer의 풀이 핸들러를 돌리므로 telebot 자체 스레드풀은 끔
+        bot = telebot.TeleBot(token, threaded=not hook)
+        try: bot.send_message(chat_id, "🤖 DeBrief V55 가동\n아이콘 및 전체 기능 복구 완료.")
+        except: pass
+
+        register_bot_handlers(bot)
+
+        BotCommand = telebot.types.BotCommand
+        try:
+            bot.set_my_commands([
+                BotCommand("eco", "📅 경제지표"), BotCommand("earning", "💰 실적 발표"),
+                BotCommand("news", "📰 뉴스"), BotCommand("summary", "📊 요약"),
+                BotCommand("p", "💰 현재가"), BotCommand("sec", "🏛️ 공시"),
+                BotCommand("ping", "🏓 생존확인"), BotCommand("list", "📋 목록"), BotCommand("stats", "📈 지표"),
+                BotCommand("subscribe", "👥 구독"), BotCommand("unsubscribe", "🚪 구독 해제"),
+                BotCommand("on", "🟢 가동"), BotCommand("off", "⛔ 정지"),
+                BotCommand("add", "➕ 추가"), BotCommand("del", "🗑️ 삭제")
+            ])
+        except: pass
+
+        publish_worker_status(start_monitor())
+        start_metrics_server()
+
+        if hook:
+            try: return run_webhook(bot, hook)
+            except Exception as e: write_log(f"웹훅 시작 실패, 롱폴링으로 전환: {e}", "WARN", stage="webhook")
+        try: bot.remove_webhook()   # 이전에 등록된 웹훅이 있으면 getUpdates가 거부됨
+        except: pass
+        write_log("📡 봇 명령 수신 시작", stage="startup", duration=time.perf_counter() - PROCESS_STARTED)
+        while True:
+            try: bot.infinity_polling(timeout=10, long_polling_timeout=5, skip_pending=True)
+            except: time.sleep(5)
+
+    except Exception as e: write_log(f"Bot Error: {e}", "ERROR", stage="bot")
+
+# ---------------------------------------------------------
+# [3-2] 독립 워커 프로세스 (python -m debrief worker)
+# ---------------------------------------------------------
+def publish_worker_status(sched):
+    """작업/발송 큐/HTTP/지표 상태를 WORKER_STATUS_INTERVAL마다 공유 저장소에 게시. 다른 프로세스의 UI는 이것만 읽음"""
+    started = time.time()
+    def run():
+        while True:
+            try:
+                state_store.put('worker', {
+                    'pid': os.getpid(), 'started': started, 'ts': time.time(), 'snapshot': market.updated,
+                    'jobs': sched.stats(), 'outbox': outbox.stats(), 'http': http.stats_snapshot(),
+                    'breakers': http.breakers_snapshot(), 'metrics': [[k, n, v] for (k, n), v in metrics.snapshot().items()]})
+            except Exception as e: write_log(f"Worker Status Err: {e}", "ERROR", stage="worker")
+            time.sleep(WORKER_STATUS_INTERVAL)
+    threading.Thread(target=run, daemon=True, name="DeBrief_Status").start()
+
+embedded_worker_lock = threading.Lock()
+
+def embedded_worker_alive():
+    """이 프로세스 안에서 워커(봇 스레드 또는 모니터 스케줄러)가 돌고 있는지"""
+    return any(t.name == "DeBrief_Worker" and t.is_alive() for t in threading.enumerate())
+
+def start_embedded_worker():
+    """다른 프로세스 워커도, 이 프로세스의 워커도 없으면 내장 워커(모니터+봇) 시작. 시작했으면 True.
+
+    UI 화면 갱신마다 부르므로, UI가 뜰 때 돌던 별도 워커가 나중에 종료되어도 이 프로세스가 이어받는다.
+    봇 토큰이 없으면 시작하지 않음 (run_bot_system이 바로 돌아오므로).
+    """
+    with embedded_worker_lock:
+        if worker_running() or embedded_worker_alive(): return False
+        if not config_store.get('telegram', {}).get('bot_token'): return False
+        threading.Thread(target=run_bot_system, daemon=True, name="DeBrief_Worker").start()
+        return True
+
+def worker_view():
+    """UI에서 볼 워커 상태. 다른 프로세스 워커가 살아 있으면 그 게시본, 아니면 이 프로세스의 객체.
+
+    external: 다른 프로세스가 워커 잠금을 쥐고 있는지, alive: 그 게시가 WORKER_STALE_AFTER 안에 있었는지
+    (external이 아니면 이 프로세스의 워커 스레드가 살아 있는지. 아무 데서도 워커가 안 돌면 False)
+    """
+    try: status, _ = state_store.get('worker')
+    except Exception: status = None
+    if not status or status['pid'] == os.getpid() or not worker_running():
+        mine = status if status and status['pid'] == os.getpid() else {}
+        return {'external': False, 'alive': embedded_worker_alive(), 'pid': os.getpid(), 'ts': time.time(), 'started': mine.get('started'),
+                'snapshot': market.updated, 'jobs': mine.get('jobs', {}), 'outbox': outbox.stats(), 'http': http.stats_snapshot(),
+                'breakers': http.breakers_snapshot(), 'metrics': metrics.snapshot()}
+    return dict(status, external=True, alive=time.time() - status['ts'] < WORKER_STALE_AFTER, breakers=status.get('breakers', {}),
+                metrics={(k, n): v for k, n, v in status['metrics']})
+
+def shutdown(*args):
+    """SIGTERM/SIGINT: 밀린 설정/알림 이력/뉴스 중복 기록/번역 캐시/로그를 기록하고 종료.
+
+    os._exit는 atexit를 건너뛰므로 atexit에 등록된 저장을 여기서 모두 부른다 (하나가 실패해도 나머지는 진행).
+    """
+    for save in (config_store.flush, save_alert_state, news_index.flush, translations.save):
+        try: save()
+        except Exception as e: write_log(f"Shutdown Err: {e}", "ERROR", stage="worker")
+    log_writer.flush(); os._exit(0)
+
+def run_worker():
+    """Streamlit 없이 모니터와 봇만 실행. UI(app.py)는 공유 상태 저장소로 이 프로세스를 본다"""
+    if not claim_worker():
+        print("이미 다른 프로세스가 워커를 실행 중입니다.", file=sys.stderr); sys.exit(1)
+    signal.signal(signal.SIGTERM, shutdown); signal.signal(signal.SIGINT, shutdown)
+    write_log(f"🛠️ 독립 워커 시작 (pid {os.getpid()})", stage="worker")
+    run_bot_system()   # 봇 토큰이 없거나 시작 중 오류면 돌아옴
+    write_log("독립 워커 종료 (봇 토큰 확인)", "WARN", stage="worker")
+    shutdown()
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m debrief", description="DeBrief 모니터/텔레그램 봇")
+    sub = p.add_subparsers(dest='command', required=True)
+    sub.add_parser('worker', help="모니터와 봇을 별도 프로세스로 실행 (Streamlit 재시작과 무관)")
+    args = p.parse_args(argv)
+    if args.command == 'worker': run_worker()
+
+IMPORT_TIMES['debrief'] = time.perf_counter() - PROCESS_STARTED
+write_log("debrief 모듈 로드", stage="startup", duration=IMPORT_TIMES['debrief'])
+
+if __name__ == '__main__':
+    main()
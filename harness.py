@@ -0,0 +1,36 @@
+"""bench.py / replay.py 공통 실행 틀.
+
+두 스크립트 모두 debrief를 임시 작업 폴더에서 import하고, 출력 줄을 모아 --out 파일에도 남긴다.
+"""
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, 'bench_fixtures')
+
+
+class Report:
+    """out(line): 화면에 바로 찍고 줄을 모아 둠. save(path)로 한 번에 기록"""
+    def __init__(self):
+        self.lines = []
+
+    def __call__(self, line):
+        print(line, flush=True); self.lines.append(line)
+
+    def save(self, path):
+        """상대 경로는 저장소 폴더 기준 (작업 폴더는 임시 폴더이므로)"""
+        if not path: return
+        with open(path if os.path.isabs(path) else os.path.join(HERE, path), 'w', encoding='utf-8') as f:
+            f.write("\n".join(self.lines) + "\n")
+
+
+def enter_workdir(prefix):
+    """엔진이 만드는 캐시/로그 파일은 임시 폴더에 (작업 트리를 건드리지 않음). 그 폴더로 옮기고 경로 반환.
+
+    debrief import 전에 불러야 한다. 사용자가 준 상대 경로는 그 전에 절대 경로로 바꿔 둘 것.
+    """
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    if HERE not in sys.path: sys.path.insert(0, HERE)
+    os.chdir(workdir)
+    return workdir
@@ -0,0 +1,207 @@
+"""DeBrief 알림 규칙 리플레이 (오프라인 백테스트).
+
+저장된 일봉(bench_fixtures 또는 OhlcvStore DB)과 뉴스 픽스처를 모의 시계에 맞춰 한 봉씩 흘려,
+라이브와 같은 지표/규칙 코드(compute_indicators -> evaluate_rules -> collect_alerts)와 뉴스 중복 판정
+(parse_rss_items -> NewsDedupIndex.claim)을 돌린다. 네트워크와 텔레그램은 쓰지 않는다.
+
+    python replay.py                                 # 픽스처 300봉 x 100종목, 봉당 장중 4틱
+    python replay.py --tickers 500 --ticks 8
+    python replay.py --db debrief_ohlcv.db           # 워커가 저장한 실제 일봉
+    python replay.py --set MOVE_PCT=2.5 --set RSI_OB=75 --repeat-window 3
+
+규칙별 알림 수, 반복 알림 비율(같은 종목·규칙이 --repeat-window 거래일 안에 다시 울린 비율),
+규칙 평가 처리량(종목-봉/초)을 출력한다. 임계값 조정 전후나 엔진 수정 전후 비교용.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from bench import FakeYahoo, load_template, make_tickers
+from harness import Report, enter_workdir
+
+REPLAY_END = '2025-12-31'   # 픽스처 일봉에 붙일 마지막 거래일 (실행일과 무관하게 결과 재현)
+NEWS_POLLS_PER_DAY = 4      # 모의 거래일마다 뉴스 픽스처를 읽는 횟수
+NEWS_TICKERS = 50           # 뉴스 리플레이에 쓰는 종목 수 상한
+
+
+class SimClock:
+    """리플레이 시각. NewsDedupIndex.clock 등 time.time 자리에 넣는다"""
+    def __init__(self):
+        self.now = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now.timestamp()
+
+    def set(self, now):
+        self.now = now
+
+
+def trading_days(d, end, n):
+    """end 이전(포함) 마지막 n개 거래일 (휴장일 제외, 시장 달력은 debrief와 공유)"""
+    days, day = [], pd.Timestamp(end).date()
+    while len(days) < n:
+        if d.is_trading_day(day): days.append(day)
+        day -= timedelta(days=1)
+    return pd.DatetimeIndex(days[::-1])
+
+
+def session_times(d, day, ticks):
+    """거래일 day의 정규장을 ticks등분한 뉴욕 시각들 (조기 마감일은 13시까지)"""
+    close = d.MARKET_HOURS['early_close'] if day in d.market_early_closes(day.year) else d.MARKET_HOURS['close']
+    open_at = datetime(day.year, day.month, day.day, tzinfo=d.MARKET_TZ) + timedelta(minutes=d.MARKET_HOURS['open'])
+    step = (close - d.MARKET_HOURS['open']) / ticks
+    return [open_at + timedelta(minutes=step * k) for k in range(1, ticks + 1)]
+
+
+def load_bars(d, args):
+    """(필드, 티커) 일봉 프레임"""
+    if args.db:
+        store = d.OhlcvStore(args.db)
+        tickers = store.tickers()[:args.tickers] if args.tickers else store.tickers()
+        data = store.load(tickers, bars=args.bars or 100000)
+    else:
+        data = FakeYahoo(None, make_tickers(args.tickers or 100), args.seed).data
+        if args.bars: data = data.tail(args.bars)
+        data.index = trading_days(d, REPLAY_END, len(data))
+    return data
+
+
+def intraday(bar, f):
+    """봉 안의 진행률 f(0~1] 시점의 (시가, 고가, 저가, 현재가, 누적 거래량).
+
+    양봉은 시가 -> 저가 -> 고가 -> 종가, 음봉은 시가 -> 고가 -> 저가 -> 종가 순으로 움직였다고 본다.
+    """
+    o, h, l, c, v = bar
+    up = c >= o
+    path = [o, np.where(up, l, h), np.where(up, h, l), c]
+    s = min(f * 3, 3.0); seg = min(int(s), 2); frac = s - seg
+    price = path[seg] + (path[seg + 1] - path[seg]) * frac
+    seen = path[:seg + 1] + [price]
+    return o, np.maximum.reduce(seen), np.minimum.reduce(seen), price, v * f
+
+
+def replay_rules(d, data, args, clock, out):
+    tickers = list(data['Close'].columns)
+    close_all, volume_all = data['Close'].to_numpy(dtype=float), data['Volume'].to_numpy(dtype=float)
+    bar_fields = [data[f].to_numpy(dtype=float) for f in ('Open', 'High', 'Low', 'Close', 'Volume')]
+    options = d.watchlist_frame(dict.fromkeys(tickers, d.ALL_MASK))
+    state = {'price': {}, 'rsi': {}, 'signal': {}}
+    last_day = {}                      # (종목, 규칙) -> 마지막 알림 봉 번호
+    counts, repeats = {}, {}
+    evals, spent = 0, 0.0
+    start = max(args.warmup, 2)
+    out(f"== rules | {len(tickers)} tickers | bars {start}..{len(data) - 1} ({data.index[start]:%Y-%m-%d} ~ "
+        f"{data.index[-1]:%Y-%m-%d}) | {args.ticks} ticks/bar | repeat window {args.repeat_window} bars ==")
+    for i in range(start, len(data)):
+        day = data.index[i].date(); today = day.strftime('%Y-%m-%d')
+        lo = max(0, i + 1 - d.SNAPSHOT_BARS)
+        close, volume = close_all[lo:i + 1].copy(), volume_all[lo:i + 1].copy()
+        bar = [f[i] for f in bar_fields]
+        for k, now in enumerate(session_times(d, day, args.ticks), 1):
+            clock.set(now)
+            _, _, _, close[-1], volume[-1] = intraday(bar, k / args.ticks)
+            close_df = pd.DataFrame(close, index=data.index[lo:i + 1], columns=tickers)
+            volume_df = pd.DataFrame(volume, index=data.index[lo:i + 1], columns=tickers)
+            t0 = time.perf_counter()
+            ind = d.compute_indicators(close_df, volume_df)
+            alerts = d.collect_alerts(ind, d.evaluate_rules(ind, options, state, today), state, today)
+            spent += time.perf_counter() - t0; evals += len(ind)
+            for ticker, rule, _, _ in alerts:
+                counts[rule] = counts.get(rule, 0) + 1
+                prev = last_day.get((ticker, rule))
+                if prev is not None and i - prev <= args.repeat_window: repeats[rule] = repeats.get(rule, 0) + 1
+                last_day[(ticker, rule)] = i
+    ticker_days = len(tickers) * (len(data) - start)
+    out(f"{'rule':<10} {'alerts':>7} {'/100 days':>10} {'repeat':>7}")
+    for rule in d.RULE_OPTIONS:
+        n = counts.get(rule, 0)
+        out(f"{rule:<10} {n:>7} {n * 100 / max(ticker_days, 1):>10.2f} {repeats.get(rule, 0) / n if n else 0:>7.1%}")
+    total = sum(counts.values())
+    out(f"{'total':<10} {total:>7} {total * 100 / max(ticker_days, 1):>10.2f} {sum(repeats.values()) / total if total else 0:>7.1%}")
+    out(f"throughput: {evals} ticker-bars in {spent:.2f}s = {evals / spent if spent else 0:,.0f} bars/s "
+        f"({(len(data) - start) * args.ticks / spent if spent else 0:,.1f} evaluations/s)")
+
+
+def replay_news(d, days, tickers, args, clock, workdir, out):
+    """거래일마다 뉴스 픽스처를 NEWS_POLLS_PER_DAY번 읽어 라이브와 같은 신선도 필터와 중복 판정을 거침.
+
+    피드에는 당일과 전일 기사가 함께 실리고(날짜별로 제목/링크가 다름), 기사 하나는 다른 URL로 재배포된다.
+    같은 기사가 두 번 울리면 반복으로 센다 (NEWS_SEEN_TTL이 NEWS_MAX_AGE보다 짧으면 생김).
+    """
+    template = load_template('google_news.rss')
+    index = d.NewsDedupIndex(os.path.join(workdir, 'replay_news_seen.json'), d.NEWS_SEEN_TTL)
+    index.clock = clock
+    items, stale, dup, sent = 0, 0, 0, 0
+    alerted = {}
+    out(f"== news | {len(tickers)} tickers | {len(days)} days | {NEWS_POLLS_PER_DAY} polls/day | "
+        f"ttl {d.NEWS_SEEN_TTL / 3600:.0f}h, max age {d.NEWS_MAX_AGE.total_seconds() / 3600:.0f}h ==")
+    for n, day in enumerate(days):
+        feed_days = [days[n - 1], day] if n else [day]
+        for now in session_times(d, day.date(), NEWS_POLLS_PER_DAY):
+            clock.set(now)
+            utc = now.astimezone(timezone.utc).replace(tzinfo=None)
+            for t in tickers:
+                for a in feed_days:
+                    published = datetime(a.year, a.month, a.day, 8, tzinfo=d.MARKET_TZ).astimezone(timezone.utc)
+                    body = template.substitute(ticker=t, pubdate=published.strftime('%a, %d %b %Y %H:%M:%S GMT'))
+                    feed = [(f"{title.split(' - ')[0]} ({a:%m/%d})", link.replace('?', f"-{a:%Y%m%d}?"), pub)
+                            for title, link, pub in d.parse_rss_items(body.encode('utf-8'))[:3]]
+                    feed.append((feed[0][0], feed[0][1].replace('?', '-amp?'), feed[0][2]))   # 재배포본
+                    for title, link, pub in feed:
+                        items += 1
+                        published = d.parse_pubdate(pub)
+                        if published and utc - published > d.NEWS_MAX_AGE: stale += 1; continue
+                        if not index.claim(t, link, title): dup += 1; continue
+                        sent += 1
+                        key = (t, title)
+                        alerted[key] = alerted.get(key, 0) + 1
+    if index.timer: index.timer.cancel()
+    repeats = sum(v - 1 for v in alerted.values())
+    out(f"items {items}, stale {stale}, deduped {dup}, alerts {sent} ({len(alerted)} articles), "
+        f"repeat {repeats / sent if sent else 0:.1%}")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument('--tickers', type=int, help="종목 수 (픽스처 기본 100, --db면 저장된 종목 전체)")
+    p.add_argument('--db', help="OhlcvStore SQLite 파일 (없으면 bench_fixtures/ohlcv_daily.csv)")
+    p.add_argument('--bars', type=int, help="최근 몇 봉만 리플레이")
+    p.add_argument('--warmup', type=int, default=60, help="지표가 채워지기 전까지 평가하지 않는 봉 수")
+    p.add_argument('--ticks', type=int, default=4, help="봉 하나를 장중 몇 번에 나눠 평가할지 (1이면 종가만)")
+    p.add_argument('--repeat-window', type=int, default=5, help="같은 종목·규칙이 이 봉 수 안에 다시 울리면 반복으로 셈")
+    p.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                   help="규칙 임계값 덮어쓰기 (MOVE_PCT, MOVE_STEP, RSI_OB, RSI_OS, VOLUME_MULT, BB_K ...)")
+    p.add_argument('--no-news', action='store_true', help="뉴스 리플레이 생략")
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--out', help="결과를 이 파일에도 기록")
+    args = p.parse_args(argv)
+    if args.ticks < 1: p.error("--ticks must be >= 1")
+
+    out = Report()
+    if args.db: args.db = os.path.abspath(args.db)
+    workdir = enter_workdir("debrief_replay_")
+    import debrief as d
+    for item in args.set:
+        name, _, value = item.partition('=')
+        current = getattr(d, name, None)
+        if not name.isupper() or not isinstance(current, (int, float, tuple)): p.error(f"unknown threshold: {name}")
+        setattr(d, name, tuple(type(c)(v) for c, v in zip(current, value.split(','))) if isinstance(current, tuple) else type(current)(value))
+        out(f"set {name} = {getattr(d, name)}")
+
+    clock = SimClock()
+    data = load_bars(d, args)
+    if data.empty or len(data) <= args.warmup: sys.exit(f"not enough bars to replay ({len(data)})")
+    replay_rules(d, data, args, clock, out)
+    if not args.no_news:
+        tickers = list(data['Close'].columns)[:NEWS_TICKERS]
+        replay_news(d, data.index[args.warmup:], tickers, args, clock, workdir, out)
+    out.save(args.out)
+
+
+if __name__ == '__main__':
+    main()
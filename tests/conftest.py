@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# debrief는 import 시점과 종료 시(atexit) 로그/캐시/상태 파일을 작업 폴더에 쓰므로 임시 폴더에서 실행 (작업 트리를 건드리지 않음)
+WORKDIR = tempfile.mkdtemp(prefix="debrief_test_")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(WORKDIR)
+
+
+def pytest_unconfigure(config):
+    os.chdir(WORKDIR)   # pytest가 시작 폴더로 되돌린 뒤 atexit 저장이 돌기 때문
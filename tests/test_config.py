@@ -0,0 +1,76 @@
+import json
+
+import debrief as d
+
+
+def load(monkeypatch, tmp_path, stored):
+    path = tmp_path / "debrief_settings.json"
+    path.write_text(json.dumps(stored, ensure_ascii=False), encoding='utf-8')
+    monkeypatch.setattr(d, 'CONFIG_FILE', str(path))
+    monkeypatch.setattr(d, 'get_jsonbin_url', lambda: None)
+    return d.fetch_config()
+
+
+def test_partial_v1_config_keeps_default_tickers(monkeypatch, tmp_path):
+    # 예전 저장본: schema/tickers 없이 텔레그램 설정만
+    config, migrated = load(monkeypatch, tmp_path, {"telegram": {"bot_token": "t", "chat_id": "1"}, "system_active": False})
+    assert migrated
+    assert config['schema'] == d.CONFIG_SCHEMA and config['option_keys'] == list(d.OPTION_KEYS)
+    assert config['tickers'] == {"TSLA": d.DEFAULT_MASK, "NVDA": d.DEFAULT_MASK}
+    assert config['subscribers'] == {}
+    assert config['system_active'] is False and config['telegram']['chat_id'] == "1"
+
+
+def test_v1_option_dicts_become_masks(monkeypatch, tmp_path):
+    stored = {"telegram": {"bot_token": "", "chat_id": "1"},
+              "tickers": {"AAPL": {"감시_ON": True, "뉴스": False, "RSI": True}},
+              "subscribers": {"2": {"tickers": {"MSFT": {"🟢 감시": True, "📰 뉴스": True}}}}}
+    config, migrated = load(monkeypatch, tmp_path, stored)
+    assert migrated
+    aapl = d.mask_to_options(config['tickers']['AAPL'])
+    assert aapl["🟢 감시"] and aapl["📉 RSI"] and not aapl["📰 뉴스"]
+    msft = d.mask_to_options(config['subscribers']['2']['tickers']['MSFT'])
+    assert msft["🟢 감시"] and msft["📰 뉴스"]
+    assert config['subscribers']['2']['eco_mode'] is True
+
+
+def test_current_schema_is_not_rewritten(monkeypatch, tmp_path):
+    stored = {"schema": d.CONFIG_SCHEMA, "option_keys": list(d.OPTION_KEYS), "telegram": {"bot_token": "", "chat_id": ""},
+              "tickers": {"AAPL": d.ALL_MASK}, "subscribers": {}}
+    config, migrated = load(monkeypatch, tmp_path, stored)
+    assert not migrated
+    assert config['tickers'] == {"AAPL": d.ALL_MASK}
+
+
+def shared_store(monkeypatch, tmp_path, shared, saved, cloud):
+    """공유 저장소에 설정 사본을 두고 (saved: 저장 완료 표시 rev 차이) JSONBin 응답을 cloud로 고정"""
+    store = d.StateStore(str(tmp_path / "state.db"))
+    rev = store.put('config', shared)
+    if saved is not None: store.put('config_saved', rev + saved)
+    monkeypatch.setattr(d, 'state_store', store)
+    monkeypatch.setattr(d, 'fetch_cloud_config', lambda: cloud)
+    monkeypatch.setattr(d, 'worker_running', lambda: False)
+    monkeypatch.setattr(d, 'CONFIG_FILE', str(tmp_path / "debrief_settings.json"))
+    return d.ConfigStore()
+
+
+def stored(tickers):
+    return {"schema": d.CONFIG_SCHEMA, "option_keys": list(d.OPTION_KEYS), "telegram": {"bot_token": "", "chat_id": "1"},
+            "tickers": tickers, "subscribers": {}}
+
+
+def test_saved_shared_copy_follows_jsonbin(monkeypatch, tmp_path):
+    # 다른 배포가 JSONBin을 고친 뒤 재기동: 저장이 끝난 로컬 공유 사본보다 JSONBin이 우선
+    cs = shared_store(monkeypatch, tmp_path, stored({"AAPL": d.ALL_MASK}), 0, stored({"MSFT": d.ALL_MASK}))
+    assert cs.get('tickers') == {"MSFT": d.ALL_MASK}
+    assert not cs.dirty
+    assert d.state_store.get('config')[0]['tickers'] == {"MSFT": d.ALL_MASK}
+
+
+def test_unsaved_shared_copy_is_kept_and_flushed(monkeypatch, tmp_path):
+    # JSONBin에 기록하기 전에 끝난 변경은 버리지 않고 다시 저장
+    cs = shared_store(monkeypatch, tmp_path, stored({"AAPL": d.ALL_MASK}), -1, stored({"MSFT": d.ALL_MASK}))
+    assert cs.get('tickers') == {"AAPL": d.ALL_MASK}
+    assert cs.dirty
+    cs.flush()
+    assert not cs.dirty and d.state_store.get('config_saved')[0] == d.state_store.rev('config')